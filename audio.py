@@ -0,0 +1,131 @@
+# NumPy and pygame are imported on first use: a NullAudio machine never loads them
+SAMPLE_RATE = 44100
+BEEP_FREQ = 440               # Hz, the classic CHIP-8 buzzer
+BEEP_SAMPLES = 4410           # 0.1 s = exactly 44 periods of 440 Hz, so it loops without a click
+VOLUME = 0.5
+PATTERN_BITS = 128            # XO-CHIP audio pattern: 16 bytes, 1 bit per step
+PATTERN_SAMPLES = 4410        # Length of the loop a pattern is played from (0.1 s)
+DEFAULT_PITCH = 64            # XO-CHIP pitch register at reset: 4000 steps/s
+
+# Mono int16 sine beeps, shared by every machine: sample rate -> samples
+_beeps = {}
+
+
+def pattern_rate(pitch):
+    """Steps per second of the XO-CHIP pattern for a pitch register value"""
+    return 4000 * 2 ** ((pitch - 64) / 48)
+
+
+def waveform(pattern=None, pitch=DEFAULT_PITCH, sample_rate=SAMPLE_RATE):
+    """One loop of the tone as mono int16 samples.
+
+    With no pattern this is the 440 Hz sine beep, synthesized once per
+    sample rate. A 16-byte pattern is played bit by bit (MSB first) at
+    pattern_rate(pitch), as XO-CHIP does, over PATTERN_SAMPLES samples;
+    patterns are not cached, as a ROM streaming audio writes a new one
+    every frame.
+    """
+    import numpy as np
+    if pattern is None:
+        samples = _beeps.get(sample_rate)
+        if samples is None:
+            t = np.arange(BEEP_SAMPLES * sample_rate // SAMPLE_RATE) / sample_rate
+            wave = np.sin(BEEP_FREQ * t * 2 * np.pi)
+            samples = _beeps[sample_rate] = (wave * VOLUME * 32767).astype(np.int16)
+        return samples
+    bits = np.unpackbits(np.frombuffer(pattern, dtype=np.uint8))
+    steps = np.arange(PATTERN_SAMPLES * sample_rate // SAMPLE_RATE) * (pattern_rate(pitch) / sample_rate)
+    wave = bits[steps.astype(np.int64) % PATTERN_BITS] * 2.0 - 1.0
+    return (wave * VOLUME * 32767).astype(np.int16)
+
+
+class NullAudio:
+    """Audio backend that plays nothing (headless runs, no mixer)"""
+
+    def __init__(self):
+        self.active = False
+        self.pattern = None
+        self.pitch = DEFAULT_PITCH
+
+    def set_active(self, active):
+        self.active = active
+
+    def set_pattern(self, pattern):
+        self.pattern = None if pattern is None else bytes(pattern)
+
+    def set_pitch(self, pitch):
+        self.pitch = pitch
+
+
+class MixerAudio(NullAudio):
+    """Looping tone on a pygame.mixer channel.
+
+    The loop starts when the tone becomes active and stops when it goes
+    inactive; nothing is allocated while it plays. There are two Sounds,
+    made once: the beep, and a pattern loop whose samples are rewritten
+    in place when the XO-CHIP pattern or pitch changes.
+    """
+
+    def __init__(self):
+        import pygame
+        super().__init__()
+        self.rate, _, self.channels = pygame.mixer.get_init()
+        self.beep = self._make(waveform(sample_rate=self.rate))
+        self.loop = self._make(waveform(bytes(16), DEFAULT_PITCH, self.rate))
+        self.loop_samples = pygame.sndarray.samples(self.loop)   # View of the loop's buffer
+        self.loop_key = None          # (pattern, pitch) the loop holds
+        self.sound = self.beep
+        self.channel = None
+
+    def _make(self, mono):
+        import numpy as np
+        import pygame
+        frames = mono if self.channels == 1 else np.repeat(mono[:, np.newaxis], self.channels, axis=1)
+        return pygame.sndarray.make_sound(np.ascontiguousarray(frames))
+
+    def _sound(self):
+        if self.pattern is None:
+            return self.beep
+        key = (self.pattern, self.pitch)
+        if key != self.loop_key:
+            mono = waveform(self.pattern, self.pitch, self.rate)
+            if self.channels == 1:
+                self.loop_samples[:] = mono
+            else:
+                self.loop_samples[:] = mono[:, None]
+            self.loop_key = key
+        return self.loop
+
+    def set_active(self, active):
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            self.channel = self.sound.play(loops=-1)
+        elif self.channel is not None:
+            self.channel.stop()
+            self.channel = None
+
+    def _switch(self):
+        sound = self._sound()
+        if sound is not self.sound:
+            self.sound = sound
+            if self.active:
+                self.set_active(False)
+                self.set_active(True)
+
+    def set_pattern(self, pattern):
+        super().set_pattern(pattern)
+        self._switch()
+
+    def set_pitch(self, pitch):
+        super().set_pitch(pitch)
+        self._switch()
+
+
+def make_audio():
+    """MixerAudio if pygame.mixer is initialized, else NullAudio"""
+    import pygame
+    if pygame.mixer.get_init():
+        return MixerAudio()
+    return NullAudio()
@@ -0,0 +1,103 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from library import ROM_EXTENSIONS
+from headless import run_headless
+from scheduler import DEFAULT_IPS
+
+DEFAULT_CYCLES = 10000
+DEFAULT_SEED = 0
+REPORT_FIELDS = ["rom", "status", "seed", "cycles", "frames", "elapsed", "ips",
+                 "unknown_opcodes", "framebuffer_hash", "error"]
+
+
+def find_roms(pattern):
+    """ROM files in a directory (recursively) or matching a glob pattern"""
+    path = Path(pattern)
+    if path.is_dir():
+        roms = [p for p in path.rglob("*") if p.suffix.lower() in ROM_EXTENSIONS]
+    else:
+        roms = [Path(p) for p in glob.glob(pattern, recursive=True)]
+    return sorted(str(p) for p in roms if p.is_file())
+
+
+def run_one(rom_file, cycles, ips, jit, seed=DEFAULT_SEED):
+    """Worker: run one ROM headless and return a report row (never raises).
+
+    Busy-wait loops are not fast-forwarded, so "ips" is a real throughput.
+    The fixed `seed` makes the framebuffer hash of ROMs using CXNN repeatable.
+    """
+    row = {"rom": rom_file, "status": "ok", "seed": seed, "error": ""}
+    try:
+        result = run_headless(rom_file, cycles=cycles, ips=ips, jit=jit, idle=False, seed=seed)
+    except Exception as e:
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+        return row
+    row.update({field: result[field] for field in REPORT_FIELDS if field in result})
+    return row
+
+
+def run_batch(roms, cycles=DEFAULT_CYCLES, ips=DEFAULT_IPS, jit=False, workers=None,
+              seed=DEFAULT_SEED):
+    """Run every ROM in a process pool, results in the same order as `roms`"""
+    n = len(roms)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(run_one, roms, [cycles] * n, [ips] * n, [jit] * n, [seed] * n))
+
+
+def write_report(rows, filename):
+    """Write rows as CSV if the file name ends with .csv, JSON otherwise"""
+    with open(filename, "w", newline="") as f:
+        if filename.lower().endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many ROMs headless in parallel")
+    parser.add_argument("roms", help="directory or glob pattern (quote it), e.g. 'Roms/*.ch8'")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES,
+                        help=f"instructions to run per ROM (default {DEFAULT_CYCLES})")
+    parser.add_argument("--ips", type=int, default=DEFAULT_IPS,
+                        help="emulated instructions per second (sets how often the timers tick)")
+    parser.add_argument("--jit", action="store_true", help="use the block compiler")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help=f"random seed for CXNN, so hashes are the same on every run (default {DEFAULT_SEED})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--report", default="report.json", help="output .json or .csv file")
+    args = parser.parse_args()
+
+    roms = find_roms(args.roms)
+    if not roms:
+        print(f"❌ No ROM found for {args.roms}")
+        sys.exit(1)
+
+    print(f"🚀 Running {len(roms)} ROMs for {args.cycles} cycles each...")
+    start = time.perf_counter()
+    rows = run_batch(roms, args.cycles, args.ips, args.jit, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for row in rows:
+        if row["status"] == "ok":
+            print(f"  ✅ {row['rom']:<40} {row['ips']:>12,.0f} instr/s  "
+                  f"unknown={row['unknown_opcodes']:<6} {row['framebuffer_hash'][:12]}")
+        else:
+            print(f"  ❌ {row['rom']:<40} {row['error']}")
+
+    write_report(rows, args.report)
+    failed = sum(row["status"] != "ok" for row in rows)
+    print(f"📄 Report written to {args.report} ({len(rows)} ROMs, {failed} failed, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from chip8 import Chip8
+from headless import run_headless
+from batch import find_roms
+from replay import InputLog, rom_hash, run_replay
+
+try:
+    import resource
+except ImportError:               # Windows
+    resource = None
+
+DATA = 0xE00                      # Scratch area for I-relative opcodes, away from code
+REPEAT = 256                      # Copies of the opcode before jumping back to 0x200
+ROUNDS = 5                        # Timing rounds per benchmark, the best one is kept
+STARTUP_TARGET = 0.10             # Seconds from interpreter start to the first headless instruction
+STARTUP_CODE = "from headless import run_headless; run_headless({rom!r}, cycles=1)"
+
+
+def _regs(**values):
+    """Setup function that loads registers (V0-VF, I) before timing"""
+    def setup(chip8):
+        for name, value in values.items():
+            if name == "I":
+                chip8.I = value
+            else:
+                chip8.V[int(name[1:], 16)] = value
+    return setup
+
+
+# name -> (opcode, setup(chip8))
+OPCODES = {
+    "6XNN LD":       (0x6A42, _regs()),
+    "7XNN ADD":      (0x7A03, _regs()),
+    "8XY0 LD":       (0x8AB0, _regs(VA=0x12, VB=0x34)),
+    "8XY1 OR":       (0x8AB1, _regs(VA=0x12, VB=0x34)),
+    "8XY2 AND":      (0x8AB2, _regs(VA=0x12, VB=0x34)),
+    "8XY3 XOR":      (0x8AB3, _regs(VA=0x12, VB=0x34)),
+    "8XY4 ADD":      (0x8AB4, _regs(VA=0x12, VB=0xF4)),
+    "8XY5 SUB":      (0x8AB5, _regs(VA=0x12, VB=0x34)),
+    "8XY6 SHR":      (0x8AB6, _regs(VA=0x12, VB=0x34)),
+    "8XY7 SUBN":     (0x8AB7, _regs(VA=0x12, VB=0x34)),
+    "8XYE SHL":      (0x8ABE, _regs(VA=0x12, VB=0x34)),
+    "DXY1 DRW":      (0xD011, _regs(V0=10, V1=5, I=DATA)),
+    "DXY5 DRW":      (0xD015, _regs(V0=10, V1=5, I=DATA)),
+    "DXYF DRW":      (0xD01F, _regs(V0=10, V1=5, I=DATA)),
+    "DXYF DRW wrap": (0xD01F, _regs(V0=60, V1=28, I=DATA)),
+    "FX33 BCD":      (0xF533, _regs(V5=237, I=DATA)),
+    "F055 LD [I]":   (0xF055, _regs(I=DATA)),
+    "F755 LD [I]":   (0xF755, _regs(I=DATA)),
+    "FF55 LD [I]":   (0xFF55, _regs(I=DATA)),
+    "F065 LD Vx":    (0xF065, _regs(I=DATA)),
+    "F765 LD Vx":    (0xF765, _regs(I=DATA)),
+    "FF65 LD Vx":    (0xFF65, _regs(I=DATA)),
+}
+
+
+def bench_opcode(opcode, setup, count=20000):
+    """Nanoseconds per execution of `opcode` through emulation_cycle (best round)"""
+    chip8 = Chip8(sound=False)
+    program = opcode.to_bytes(2, "big") * REPEAT + b"\x12\x00"   # ... JP 200
+    chip8.memory[0x200:0x200 + len(program)] = program
+    chip8.memory[DATA:DATA + 16] = bytes(range(0xF0, 0x100))
+    chip8.invalidate(0x200, len(program))
+    setup(chip8)
+
+    step = chip8.emulation_cycle
+    for _ in range(REPEAT + 1):    # Warm the decode cache
+        step()
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(count):
+            step()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e9
+
+
+def bench_rom(rom_file, cycles, jit=False):
+    """Headless throughput of a ROM (best of ROUNDS runs).
+
+    Busy-wait loops are executed, not fast-forwarded, so instructions/s
+    counts instructions that actually ran.
+    """
+    result = max((run_headless(rom_file, cycles=cycles, jit=jit, seed=0, idle=False)
+                  for _ in range(ROUNDS)),
+                 key=lambda r: r["ips"])
+    return _throughput(result)
+
+
+def bench_replay(rom_file, log_file, jit=False):
+    """Throughput of a recorded play session (best of ROUNDS replays)"""
+    result = max((run_replay(rom_file, log_file, jit=jit, idle=False) for _ in range(ROUNDS)),
+                 key=lambda r: r["ips"])
+    if not result["matches"]:
+        raise ValueError(f"{log_file} no longer replays to the recorded screen")
+    return _throughput(result)
+
+
+def _throughput(result):
+    return {
+        "ips": result["ips"],
+        "fps": result["frames"] / result["elapsed"] if result["elapsed"] else 0.0,
+        "elapsed": result["elapsed"],
+    }
+
+
+def startup_time(rom_file):
+    """Wall time of a fresh interpreter running one headless instruction (best of ROUNDS).
+
+    This is what every short scripted run pays before emulating anything:
+    interpreter start, imports, machine setup and ROM load.
+    """
+    command = [sys.executable, "-c", STARTUP_CODE.format(rom=str(Path(rom_file).resolve()))]
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=Path(__file__).parent, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss   # macOS reports bytes
+
+
+def run_benchmarks(rom_pattern="Roms", cycles=100000, jit=False, only=None, replays=()):
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cycles": cycles,
+            "jit": jit,
+        },
+        "opcodes": {},
+        "roms": {},
+        "replays": {},
+    }
+    for name, (opcode, setup) in OPCODES.items():
+        if only is None or only in name:
+            results["opcodes"][name] = bench_opcode(opcode, setup)
+            print(f"  {name:<16} {results['opcodes'][name]:>9.0f} ns/op")
+    for rom in find_roms(rom_pattern):
+        if only is None or only in rom:
+            results["roms"][Path(rom).name] = r = bench_rom(rom, cycles, jit)
+            print(f"  {Path(rom).name:<24} {r['ips']:>12,.0f} instr/s {r['fps']:>10,.0f} frames/s")
+    if replays:
+        roms = {rom_hash(rom): rom for rom in find_roms(rom_pattern)}
+        for log_file in replays:
+            rom = roms.get(InputLog.load(log_file).rom_sha1)
+            if rom is None:
+                print(f"  ⚠️  {log_file}: its ROM is not in {rom_pattern}, skipped")
+                continue
+            results["replays"][Path(log_file).name] = r = bench_replay(rom, log_file, jit)
+            print(f"  {Path(log_file).name:<24} {r['ips']:>12,.0f} instr/s {r['fps']:>10,.0f} frames/s")
+    roms = find_roms(rom_pattern)
+    if roms and only is None:
+        results["startup"] = startup_time(roms[0])
+        print(f"  Startup (first instruction) {results['startup'] * 1000:>6.1f} ms "
+              f"(target {STARTUP_TARGET * 1000:.0f} ms)")
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+def compare(results, baseline, threshold=0.10):
+    """List of regressions worse than `threshold` (0.10 = 10%) against a baseline"""
+    regressions = []
+    for name, ns in results["opcodes"].items():
+        old = baseline.get("opcodes", {}).get(name)
+        if old and ns > old * (1 + threshold):
+            regressions.append(f"{name}: {old:.0f} → {ns:.0f} ns/op (+{ns / old - 1:.0%})")
+    for name, rom in [*results["roms"].items(), *results.get("replays", {}).items()]:
+        old = baseline.get("roms", {}).get(name) or baseline.get("replays", {}).get(name)
+        if old and rom["ips"] < old["ips"] * (1 - threshold):
+            regressions.append(f"{name}: {old['ips']:,.0f} → {rom['ips']:,.0f} instr/s "
+                               f"({rom['ips'] / old['ips'] - 1:.0%})")
+    startup = results.get("startup")
+    if startup is not None:
+        old = baseline.get("startup")
+        if startup > STARTUP_TARGET:
+            regressions.append(f"startup: {startup * 1000:.1f} ms, over the "
+                               f"{STARTUP_TARGET * 1000:.0f} ms target")
+        elif old and startup > old * (1 + threshold):
+            regressions.append(f"startup: {old * 1000:.1f} → {startup * 1000:.1f} ms "
+                               f"(+{startup / old - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chip-8 emulator benchmarks")
+    parser.add_argument("--roms", default="Roms", help="directory or glob of ROMs to time")
+    parser.add_argument("--cycles", type=int, default=100000, help="instructions per ROM")
+    parser.add_argument("--jit", action="store_true", help="time ROMs with the block compiler")
+    parser.add_argument("--replays", nargs="*", default=(), metavar="LOG",
+                        help="input logs made with main.py --record to time as whole sessions")
+    parser.add_argument("--only", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown that counts as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args()
+
+    print("⏱️  Chip-8 benchmarks")
+    results = run_benchmarks(args.roms, args.cycles, args.jit, args.only, args.replays)
+    print(f"  Peak RSS: {results['peak_rss_kb']} KB")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ No regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
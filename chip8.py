@@ -0,0 +1,851 @@
+import random
+from array import array
+from functools import partial
+
+from audio import NullAudio, DEFAULT_PITCH
+from tracer import TRACE_OFF, TRACE_PRINT
+from quirks import get_quirks, has_opcode, DEFAULT_QUIRKS
+
+
+# Chip-8 fontset (0-F)
+fontset = [
+    0xF0, 0x90, 0x90, 0x90, 0xF0,  # 0
+    0x20, 0x60, 0x20, 0x20, 0x70,  # 1
+    0xF0, 0x10, 0xF0, 0x80, 0xF0,  # 2
+    0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 3
+    0x90, 0x90, 0xF0, 0x10, 0x10,  # 4
+    0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 5
+    0xF0, 0x80, 0xF0, 0x90, 0xF0,  # 6
+    0xF0, 0x10, 0x20, 0x40, 0x40,  # 7
+    0xF0, 0x90, 0xF0, 0x90, 0xF0,  # 8
+    0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 9
+    0xF0, 0x90, 0xF0, 0x90, 0x90,  # A
+    0xE0, 0x90, 0xE0, 0x90, 0xE0,  # B
+    0xF0, 0x80, 0x80, 0x80, 0xF0,  # C
+    0xE0, 0x90, 0x90, 0x90, 0xE0,  # D
+    0xF0, 0x80, 0xF0, 0x80, 0xF0,  # E
+    0xF0, 0x80, 0xF0, 0x80, 0x80   # F
+]
+
+# SCHIP/XO-CHIP 8x10 fontset (0-F)
+bigfont = [
+    0xFF, 0xFF, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF,  # 0
+    0x18, 0x78, 0x78, 0x18, 0x18, 0x18, 0x18, 0x18, 0xFF, 0xFF,  # 1
+    0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF,  # 2
+    0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 3
+    0xC3, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF, 0x03, 0x03, 0x03, 0x03,  # 4
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 5
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF,  # 6
+    0xFF, 0xFF, 0x03, 0x03, 0x06, 0x0C, 0x18, 0x18, 0x18, 0x18,  # 7
+    0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF,  # 8
+    0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 9
+    0x7E, 0xFF, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF, 0xC3, 0xC3, 0xC3,  # A
+    0xFC, 0xFC, 0xC3, 0xC3, 0xFC, 0xFC, 0xC3, 0xC3, 0xFC, 0xFC,  # B
+    0x3C, 0xFF, 0xC3, 0xC0, 0xC0, 0xC0, 0xC0, 0xC3, 0xFF, 0x3C,  # C
+    0xFC, 0xFE, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xFE, 0xFC,  # D
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF,  # E
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC0, 0xC0, 0xC0, 0xC0   # F
+]
+FONT_ADDR, BIGFONT_ADDR = 0x50, 0xA0
+
+MEMORY_SIZE = 0x1000          # CHIP-8 and SCHIP
+XO_MEMORY_SIZE = 0x10000      # XO-CHIP
+LORES, HIRES = (64, 32), (128, 64)
+DISPLAY_SIZE = 64 * 32        # Low resolution, the only one plain CHIP-8 has
+# Pixel value (bit k = XO-CHIP plane k+1) -> color
+PALETTE = [(0, 0, 0), (255, 255, 255), (170, 170, 170), (85, 85, 85)]
+
+# Display bytes of each sprite byte value: 8 pixels, one byte each
+SPRITE_BITS = [bytes((b >> (7 - c)) & 1 for c in range(8)) for b in range(256)]
+# One sprite row per byte value as a whole display row (8 pixels, then padding
+# up to the next row): SPRITE_ROWS[0x81][:8] == b"\x01\0\0\0\0\0\0\x01"
+SPRITE_ROWS = [bits + bytes(56) for bits in SPRITE_BITS]
+HIRES_SPRITE_ROWS = [bits + bytes(120) for bits in SPRITE_BITS]
+
+# Bit planes (FN01 mask) -> shift of each selected plane's bit in a display byte
+PLANE_SHIFTS = [(), (0,), (1,), (0, 1)]
+# Bytes a display byte can hold that use a plane outside the mask
+OTHER_PLANES = [b"", b"\x02\x03", b"\x01\x03", b""]
+
+
+class Chip8:
+    __slots__ = (
+        "sound", "memory", "V", "I", "pc", "display", "delay_timer",
+        "sound_timer", "stack", "sp", "key", "draw_flag", "audio", "unknown_opcodes", "warned", "rng",
+        "width", "height", "planes", "flags", "quirks", "vblank",
+        "trace", "trace_print", "profiler", "jit", "_gfx", "_cache", "_alu_ops", "_misc_ops",
+        "_sprite_rows", "_plane_shifts", "_blit", "_jump",
+    )
+
+    def __init__(self, sound=True, seed=None, memory_size=MEMORY_SIZE, quirks=DEFAULT_QUIRKS):
+        self.sound = sound                # False: no pygame mixer needed
+        self.audio = NullAudio()          # Buzzer backend (see audio.py)
+        if sound:
+            from audio import make_audio
+            self.audio = make_audio()
+        self.rng = random.Random(seed)    # CXNN source; a fixed seed makes runs repeatable
+        self.memory = bytearray(memory_size)  # 4K memory (64K for XO-CHIP)
+        self.V = bytearray(16)            # 16 registers V0-VF
+        self.I = 0                        # Index register
+        self.pc = 0x200                   # Program counter starts at 0x200
+        self.set_resolution(LORES)        # Display, one byte per pixel (bit k = plane k+1)
+        self.set_planes(1)                # Bit planes drawn to (XO-CHIP FN01)
+        self.flags = bytearray(16)        # SCHIP RPL user flags (FX75/FX85), kept across resets
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.stack = array("H", bytes(2 * 16))  # 16 levels of return addresses
+        self.sp = 0                       # Stack pointer
+        self.key = bytearray(16)          # HEX based keypad
+        self.draw_flag = False
+        self.vblank = True                # A DXYN may run this frame (display_wait quirk)
+        self.unknown_opcodes = 0          # Unknown opcodes executed since reset
+        self.warned = set()               # Problems already reported, see _warn()
+        self._cache = [None] * memory_size    # Decoded handler per address
+        self.trace = None                 # TraceBuffer when tracing is on
+        self.trace_print = False
+        self.profiler = None              # Profiler attached by profiler.py
+        self.jit = None                   # BlockCompiler attached by jit.py
+
+        # Sub-tables for the 8XYN and FXNN opcode groups
+        self._alu_ops = {
+            0x0: self._op_ld_reg,
+            0x1: self._op_or,
+            0x2: self._op_and,
+            0x3: self._op_xor,
+            0x4: self._op_add_reg,
+            0x5: self._op_sub,
+            0x6: self._op_shr,
+            0x7: self._op_subn,
+            0xE: self._op_shl,
+        }
+        self._misc_ops = {
+            0x07: self._op_ld_vx_dt,
+            0x0A: self._op_ld_vx_k,
+            0x15: self._op_ld_dt_vx,
+            0x18: self._op_ld_st_vx,
+            0x1E: self._op_add_i_vx,
+            0x29: self._op_ld_f_vx,
+            0x30: self._op_ld_hf_vx,
+            0x33: self._op_ld_b_vx,
+            0x3A: self._op_pitch,
+            0x55: self._op_ld_i_vx,
+            0x65: self._op_ld_vx_i,
+            0x75: self._op_ld_r_vx,
+            0x85: self._op_ld_vx_r,
+        }
+        self.set_quirks(quirks)           # Fills in the entries that depend on the profile
+
+        # Load fontset
+        self.initialize()
+
+    def initialize(self):
+        # Reset memory, registers, timers, etc. (in place: views stay valid)
+        self.memory[:] = bytes(len(self.memory))
+        self.V[:] = bytes(16)
+        self.I = 0
+        self.pc = 0x200
+        if (self.width, self.height) == LORES:
+            self.display[:] = bytes(DISPLAY_SIZE)
+        else:
+            self.set_resolution(LORES)
+        self.set_planes(1)
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.stack[:] = array("H", bytes(2 * 16))
+        self.sp = 0
+        self.key[:] = bytes(16)
+        self.draw_flag = False
+        self.vblank = True
+        self.audio.set_active(False)
+        self.audio.set_pattern(None)
+        self.audio.set_pitch(DEFAULT_PITCH)
+        self.unknown_opcodes = 0
+        self.warned.clear()
+        self._cache = [None] * len(self.memory)
+        if self.jit is not None:
+            self.jit.reset()
+
+        # Load fontsets into memory at 0x50 and 0xA0
+        self.memory[FONT_ADDR:FONT_ADDR + len(fontset)] = bytes(fontset)
+        self.memory[BIGFONT_ADDR:BIGFONT_ADDR + len(bigfont)] = bytes(bigfont)
+
+    @property
+    def gfx(self):
+        """(height, width) NumPy view of the display, gfx[y, x]; NumPy is only imported here"""
+        if self._gfx is None:
+            import numpy as np
+            self._gfx = np.frombuffer(self.display, dtype=np.uint8).reshape(self.height, self.width)
+        return self._gfx
+
+    def set_resolution(self, resolution):
+        """Switch to LORES or HIRES with a blank display (a new bytearray: old views go stale)"""
+        self.width, self.height = resolution
+        self.display = bytearray(self.width * self.height)
+        self._gfx = None
+        self._sprite_rows = HIRES_SPRITE_ROWS if resolution == HIRES else SPRITE_ROWS
+        self.draw_flag = True
+
+    def set_quirks(self, name):
+        """Switch to a quirk profile (see quirks.py).
+
+        The handlers that differ are picked here, once: decode() and the
+        drawing code then run the chosen ones without testing any flag.
+        """
+        quirks = self.quirks = get_quirks(name)
+        if quirks.memory_size > len(self.memory):
+            self.set_memory_size(quirks.memory_size)
+
+        alu, misc = self._alu_ops, self._misc_ops
+        if quirks.vf_reset:
+            alu[0x1], alu[0x2], alu[0x3] = self._op_or_reset, self._op_and_reset, self._op_xor_reset
+        else:
+            alu[0x1], alu[0x2], alu[0x3] = self._op_or, self._op_and, self._op_xor
+        if quirks.shifting:
+            alu[0x6], alu[0xE] = self._op_shr_vy, self._op_shl_vy
+        else:
+            alu[0x6], alu[0xE] = self._op_shr, self._op_shl
+        if quirks.memory is None:
+            misc[0x55], misc[0x65] = self._op_ld_i_vx, self._op_ld_vx_i
+        else:
+            misc[0x55] = partial(self._op_ld_i_vx_inc, quirks.memory)
+            misc[0x65] = partial(self._op_ld_vx_i_inc, quirks.memory)
+        self._jump = {"v0": self._op_jp_v0, "vx": self._op_jp_vx}.get(quirks.jumping)
+        if quirks.sprites == "flat":
+            self._blit = self._blit_flat
+        else:
+            self._blit = partial(self._blit_edges, quirks.sprites == "wrap")
+
+        self._cache = [None] * len(self.memory)   # Decoded with the old handlers
+        if self.jit is not None:
+            self.jit.reset()
+
+    def set_planes(self, planes):
+        """Select the bit planes drawn, cleared and scrolled (mask 0-3, XO-CHIP)"""
+        self.planes = planes
+        self._plane_shifts = PLANE_SHIFTS[planes]
+
+    def set_memory_size(self, size):
+        """Grow or shrink memory (XO-CHIP has 64K), keeping its contents"""
+        if size != len(self.memory):
+            del self.memory[size:]
+            self.memory.extend(bytes(size - len(self.memory)))
+            self._cache = [None] * size
+            if self.jit is not None:
+                self.jit.reset()
+
+    def set_trace(self, level, size=1024):
+        """Switch tracing on/off at runtime (see tracer.py)"""
+        if self.profiler is not None:
+            raise ValueError("Profiling and tracing cannot be combined")
+        if level == TRACE_OFF:
+            self.trace = None
+            self.__class__ = Chip8
+        else:
+            from tracer import TraceBuffer
+            self.trace = TraceBuffer(size)
+            self.trace_print = level == TRACE_PRINT
+            self.__class__ = TracedChip8
+
+    def prewarm(self, addresses):
+        """Decode the instructions at `addresses` ahead of time (see disasm.prewarm)"""
+        for addr in addresses:
+            if self._cache[addr] is None and addr + 1 < len(self.memory):
+                self._cache[addr] = self.decode((self.memory[addr] << 8) | self.memory[addr + 1])
+
+    def load_program(self, filename):
+        """Copy a ROM file to 0x200; returns its size in bytes"""
+        with open(filename, "rb") as f:
+            program = f.read()
+        if len(program) > len(self.memory) - 0x200:
+            if len(program) > XO_MEMORY_SIZE - 0x200:
+                raise ValueError(f"ROM too large ({len(program)} bytes, max {XO_MEMORY_SIZE - 0x200})")
+            self.set_memory_size(XO_MEMORY_SIZE)   # Only XO-CHIP ROMs are this big
+        self.memory[0x200:0x200+len(program)] = program
+        self.invalidate(0x200, len(program))
+        return len(program)
+    
+    def update_timers(self):
+        """Decrement timers at 60Hz"""
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        self.vblank = True
+        # The tone plays for as many frames as the sound timer was set to
+        self.audio.set_active(self.sound_timer > 0)
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+    
+    def invalidate(self, addr, length=1):
+        """Drop cached decodes overlapping memory[addr:addr+length]"""
+        start = max(addr - 1, 0)
+        self._cache[start:addr + length] = [None] * (min(addr + length, len(self._cache)) - start)
+        if self.jit is not None:
+            self.jit.invalidate(addr, length)
+
+    def decode(self, opcode):
+        """Turn an opcode into a handler with its operands already bound"""
+        if not has_opcode(self.quirks, opcode):
+            # SCHIP / XO-CHIP instruction on a platform that does not have it
+            return partial(self._op_unknown, opcode, "")
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        nn = opcode & 0x00FF
+        nnn = opcode & 0x0FFF
+
+        match (opcode & 0xF000):
+            case (0x0000):
+                match nn:
+                    case (0x00E0):
+                        return partial(self._op_cls)
+                    case (0x00EE):
+                        return partial(self._op_ret)
+                match opcode:
+                    case (0x00FB):
+                        return partial(self._op_scroll_right)
+                    case (0x00FC):
+                        return partial(self._op_scroll_left)
+                    case (0x00FD):
+                        return partial(self._op_exit)
+                    case (0x00FE):
+                        return partial(self._op_resolution, LORES)
+                    case (0x00FF):
+                        return partial(self._op_resolution, HIRES)
+                if x == 0 and y == 0xC:
+                    return partial(self._op_scroll_down, n)
+                if x == 0 and y == 0xD:
+                    return partial(self._op_scroll_up, n)
+            case (0x1000):
+                return partial(self._op_jp, nnn)
+            case (0x2000):
+                return partial(self._op_call, nnn)
+            case (0x3000):
+                return self._skip(partial(self._op_se_byte, x, nn))
+            case (0x4000):
+                return self._skip(partial(self._op_sne_byte, x, nn))
+            case (0x5000):
+                match n:
+                    case (0x2):
+                        return partial(self._op_save_range, x, y)
+                    case (0x3):
+                        return partial(self._op_load_range, x, y)
+                return self._skip(partial(self._op_se_reg, x, y))
+            case (0x6000):
+                return partial(self._op_ld_byte, x, nn)
+            case (0x7000):
+                return partial(self._op_add_byte, x, nn)
+            case (0x8000):
+                handler = self._alu_ops.get(n)
+                if handler is not None:
+                    return partial(handler, x, y)
+            case (0x9000):
+                return self._skip(partial(self._op_sne_reg, x, y))
+            case (0xA000):
+                return partial(self._op_ld_i, nnn)
+            case (0xB000):
+                if self._jump is not None:
+                    return partial(self._jump, x, nnn)
+            case (0xC000):
+                return partial(self._op_rnd, x, nn)
+            case (0xD000):
+                if n == 0:
+                    handler = partial(self._op_drw_big, x, y)
+                else:
+                    handler = partial(self._op_drw, x, y, n)
+                if self.quirks.display_wait:
+                    return partial(self._op_wait_vblank, handler)
+                return handler
+            case (0xE000):
+                match nn:
+                    case (0x009E):
+                        return self._skip(partial(self._op_skp, x))
+                    case (0x00A1):
+                        return self._skip(partial(self._op_sknp, x))
+            case (0xF000):
+                match opcode:
+                    case (0xF000):
+                        return partial(self._op_ld_i_long)
+                    case (0xF002):
+                        return partial(self._op_audio)
+                if nn == 0x01:
+                    return partial(self._op_plane, x)
+                handler = self._misc_ops.get(nn)
+                if handler is not None:
+                    return partial(handler, x)
+            case (_):
+                return partial(self._op_unknown, opcode, "")
+
+        return partial(self._op_unknown, opcode, f" [0x{opcode & 0xF000:04X}]")
+
+    def _skip(self, handler):
+        """With XO-CHIP memory, make a skip step over a whole 4-byte F000 NNNN"""
+        if len(self.memory) <= MEMORY_SIZE:
+            return handler
+        return partial(self._op_skip_long, handler)
+
+    def emulation_cycle(self):
+        # Fetch + decode (cached per address)
+        handler = self._cache[self.pc]
+        if handler is None:
+            opcode = (self.memory[self.pc] << 8) | self.memory[self.pc + 1]
+            handler = self._cache[self.pc] = self.decode(opcode)
+
+        # Execute (timers are ticked by the scheduler, see update_timers)
+        handler()
+
+    # --- Opcode handlers ---
+
+    def _warn(self, key, message):
+        """Print `message` the first time `key` comes up since reset, so a ROM stuck
+        on a bad instruction does not flood the output"""
+        if key not in self.warned:
+            self.warned.add(key)
+            print(message)
+
+    def _op_unknown(self, opcode, group):
+        self.unknown_opcodes += 1
+        self._warn(opcode, f"Unknown opcode{group}: 0x{opcode:X}")
+        self.pc += 2
+
+    def _op_cls(self):  # 00E0 (XO-CHIP: selected planes only)
+        self._shift_display(len(self.display))
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_scroll_down(self, n):  # 00CN
+        self._shift_display(n * self.width)
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_scroll_up(self, n):  # 00DN (XO-CHIP)
+        self._shift_display(-n * self.width)
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_scroll_right(self):  # 00FB
+        self._shift_display(4, columns=True)
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_scroll_left(self):  # 00FC
+        self._shift_display(-4, columns=True)
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_exit(self):  # 00FD: stay on this instruction forever
+        pass
+
+    def _op_resolution(self, resolution):  # 00FE / 00FF
+        self.set_resolution(resolution)
+        self.pc += 2
+
+    def _shift_display(self, shift, columns=False):
+        """Move the selected planes `shift` bytes towards the end of the display, filling with 0.
+
+        The display is one flat array, so scrolling is a slice move;
+        column shifts then blank the columns that wrapped in from the
+        neighbouring rows. Planes outside the FN01 mask are left alone.
+        """
+        display = self.display
+        size = len(display)
+        if not self.planes:
+            return
+        other = OTHER_PLANES[self.planes]
+        if any(b in display for b in other):
+            # Rare: both planes in use but only one selected, so go through bit masks
+            mask = int.from_bytes(bytes([self.planes]) * size, "big")
+            pixels = int.from_bytes(display, "big")
+            moved = bytearray((pixels & mask).to_bytes(size, "big"))
+            _shift_bytes(moved, shift, self.width if columns else 0)
+            display[:] = ((pixels & ~mask) | int.from_bytes(moved, "big")).to_bytes(size, "big")
+        else:
+            _shift_bytes(display, shift, self.width if columns else 0)
+
+    def _op_ret(self):  # 00EE
+        if self.sp == 0:
+            self._warn(("RET", self.pc), f"⚠️ Stack underflow: RET without CALL at {self.pc:03X}")
+            self.pc += 2
+            return
+        self.sp -= 1
+        self.pc = self.stack[self.sp]
+
+    def _op_jp(self, nnn):  # 1NNN
+        self.pc = nnn
+
+    def _op_call(self, nnn):  # 2NNN
+        if self.sp == len(self.stack):
+            self._warn(("CALL", self.pc), f"⚠️ Stack overflow: more than 16 nested CALLs at {self.pc:03X}")
+            self.pc += 2
+            return
+        self.stack[self.sp] = self.pc + 2
+        self.sp += 1
+        self.pc = nnn
+
+    def _op_se_byte(self, x, nn):  # 3XNN
+        if self.V[x] == nn:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_sne_byte(self, x, nn):  # 4XNN
+        if self.V[x] != nn:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_se_reg(self, x, y):  # 5XY0
+        if self.V[x] == self.V[y]:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_ld_byte(self, x, nn):  # 6XNN
+        self.V[x] = nn
+        self.pc += 2
+
+    def _op_add_byte(self, x, nn):  # 7XNN
+        self.V[x] = (self.V[x] + nn) & 0xFF
+        self.pc += 2
+
+    def _op_ld_reg(self, x, y):  # 8XY0
+        self.V[x] = self.V[y]
+        self.pc += 2
+
+    def _op_or(self, x, y):  # 8XY1
+        self.V[x] |= self.V[y]
+        self.pc += 2
+
+    def _op_and(self, x, y):  # 8XY2
+        self.V[x] &= self.V[y]
+        self.pc += 2
+
+    def _op_xor(self, x, y):  # 8XY3
+        self.V[x] ^= self.V[y]
+        self.pc += 2
+
+    def _op_or_reset(self, x, y):  # 8XY1 (vf_reset quirk)
+        self.V[x] |= self.V[y]
+        self.V[0xF] = 0
+        self.pc += 2
+
+    def _op_and_reset(self, x, y):  # 8XY2 (vf_reset quirk)
+        self.V[x] &= self.V[y]
+        self.V[0xF] = 0
+        self.pc += 2
+
+    def _op_xor_reset(self, x, y):  # 8XY3 (vf_reset quirk)
+        self.V[x] ^= self.V[y]
+        self.V[0xF] = 0
+        self.pc += 2
+
+    def _op_add_reg(self, x, y):  # 8XY4
+        result = self.V[x] + self.V[y]
+        self.V[0xF] = 1 if result > 0xFF else 0
+        self.V[x] = result & 0xFF
+        self.pc += 2
+
+    def _op_sub(self, x, y):  # 8XY5
+        self.V[0xF] = 1 if self.V[x] >= self.V[y] else 0
+        self.V[x] = (self.V[x] - self.V[y]) & 0xFF
+        self.pc += 2
+
+    def _op_shr(self, x, y):  # 8XY6
+        self.V[0xF] = self.V[x] & 0x1
+        self.V[x] >>= 1
+        self.pc += 2
+
+    def _op_subn(self, x, y):  # 8XY7
+        self.V[0xF] = 1 if self.V[y] >= self.V[x] else 0
+        self.V[x] = (self.V[y] - self.V[x]) & 0xFF
+        self.pc += 2
+
+    def _op_shl(self, x, y):  # 8XYE
+        self.V[0xF] = (self.V[x] & 0x80) >> 7
+        self.V[x] = (self.V[x] << 1) & 0xFF
+        self.pc += 2
+
+    def _op_shr_vy(self, x, y):  # 8XY6 (shifting quirk: VX = VY >> 1)
+        flag = self.V[y] & 0x1
+        self.V[x] = self.V[y] >> 1
+        self.V[0xF] = flag
+        self.pc += 2
+
+    def _op_shl_vy(self, x, y):  # 8XYE (shifting quirk: VX = VY << 1)
+        flag = self.V[y] >> 7
+        self.V[x] = (self.V[y] << 1) & 0xFF
+        self.V[0xF] = flag
+        self.pc += 2
+
+    def _op_sne_reg(self, x, y):  # 9XY0
+        if self.V[x] != self.V[y]:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_ld_i(self, nnn):  # ANNN
+        self.I = nnn
+        self.pc += 2
+
+    def _op_jp_v0(self, x, nnn):  # BNNN
+        self.pc = (nnn + self.V[0]) & 0xFFF
+
+    def _op_jp_vx(self, x, nnn):  # BXNN (CHIP-48/SCHIP)
+        self.pc = (nnn + self.V[x]) & 0xFFF
+
+    def _op_rnd(self, x, nn):  # CXNN
+        self.V[x] = self.rng.randint(0, 255) & nn
+        self.pc += 2
+
+    def _op_drw(self, vx, vy, height):  # DXYN
+        offset = self.V[vx] % self.width + self.V[vy] % self.height * self.width
+        table = self._sprite_rows
+        if self.planes == 1:
+            collision = self._blit(offset, [table[b] for b in self.memory[self.I:self.I + height]], 8, 0)
+        else:
+            collision = 0
+            addr = self.I
+            for shift in self._plane_shifts:  # XO-CHIP: one sprite per selected plane, back to back
+                collision |= self._blit(offset, [table[b] for b in self.memory[addr:addr + height]], 8, shift)
+                addr += height
+
+        self.V[0xF] = 1 if collision else 0
+        self.draw_flag = True
+        self.pc += 2
+
+    def _op_wait_vblank(self, draw):  # DXYN (display_wait quirk): one sprite per frame
+        if self.vblank:
+            self.vblank = False
+            draw()
+
+    def _op_drw_big(self, vx, vy):  # DXY0 (SCHIP/XO-CHIP 16x16 sprite)
+        offset = self.V[vx] % self.width + self.V[vy] % self.height * self.width
+        padding = bytes(self.width - 16)
+        collision = 0
+        addr = self.I
+        for shift in self._plane_shifts:
+            data = self.memory[addr:addr + 32]
+            rows = [SPRITE_BITS[data[i]] + SPRITE_BITS[data[i + 1]] + padding
+                    for i in range(0, len(data) - 1, 2)]
+            collision |= self._blit(offset, rows, 16, shift)
+            addr += 32
+
+        self.V[0xF] = 1 if collision else 0
+        self.draw_flag = True
+        self.pc += 2
+
+    def _blit_flat(self, offset, rows, sprite_width, shift):
+        """XOR sprite rows (one display row each) at offset, wrapping past the end; non-zero on collision"""
+        width = self.width
+        size = len(self.display)
+        if offset + len(rows) * width - (width - sprite_width) <= size:
+            return self._xor_rows(offset, rows, sprite_width, shift)
+
+        # Sprite runs past the last pixel: rows that fit, the row that
+        # straddles the end (pixel by pixel), then the rest from the top
+        fit = max(0, (size - sprite_width - offset) // width + 1)
+        wrap = (size - 1 - offset) // width + 1
+        collision = self._xor_rows(offset, rows[:fit], sprite_width, shift)
+        display = self.display
+        bit = 1 << shift
+        for row in range(fit, min(wrap, len(rows))):
+            for col in range(sprite_width):
+                if rows[row][col]:
+                    p = (offset + row * width + col) % size
+                    collision |= display[p] & bit
+                    display[p] ^= bit
+        collision |= self._xor_rows(offset + wrap * width - size, rows[wrap:], sprite_width, shift)
+        return collision
+
+    def _blit_edges(self, wrap, offset, rows, sprite_width, shift):
+        """_blit for the "clip" and "wrap" quirks: what is past the right or bottom edge
+        is dropped, or drawn from the left or top edge"""
+        width, height = self.width, self.height
+        y, x = divmod(offset, width)
+        keep = min(sprite_width, width - x)   # Columns left of the right edge
+        parts = [(offset, rows[:height - y])]
+        if wrap:
+            parts.append((x, rows[height - y:]))
+        collision = 0
+        for start, part in parts:
+            if not part:
+                continue
+            if keep == sprite_width:
+                collision |= self._xor_rows(start, part, sprite_width, shift)
+                continue
+            left = [row[:keep] + bytes(width - keep) for row in part]
+            collision |= self._xor_rows(start, left, keep, shift)
+            if wrap:
+                right = [row[keep:sprite_width] + bytes(width - sprite_width + keep) for row in part]
+                collision |= self._xor_rows(start - x, right, sprite_width - keep, shift)
+        return collision
+
+    def _xor_rows(self, offset, rows, sprite_width, shift):
+        """XOR sprite rows (a display row apart, all on screen) into the display; non-zero on collision"""
+        if not rows:
+            return 0
+        padding = self.width - sprite_width
+        end = offset + len(rows) * self.width - padding
+        # The whole span as one big integer, so a tall sprite costs about the same as one row
+        sprite = int.from_bytes(b"".join(rows), "big") >> (padding * 8) << shift
+        pixels = int.from_bytes(self.display[offset:end], "big")
+        self.display[offset:end] = (pixels ^ sprite).to_bytes(end - offset, "big")
+        return pixels & sprite
+
+    def _op_skp(self, x):  # EX9E
+        if self.key[self.V[x]]:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_sknp(self, x):  # EXA1
+        if not self.key[self.V[x]]:
+            self.pc += 4
+        else:
+            self.pc += 2
+
+    def _op_ld_vx_dt(self, x):  # FX07
+        self.V[x] = self.delay_timer
+        self.pc += 2
+
+    def _op_ld_vx_k(self, x):  # FX0A (wait for key)
+        key_pressed = None
+        for i in range(16):
+            if self.key[i] != 0:
+                self.V[x] = i
+                key_pressed = i
+                break
+
+        if key_pressed is None:
+            return  # Don't increment PC, wait for key
+        self.pc += 2
+
+    def _op_ld_dt_vx(self, x):  # FX15
+        self.delay_timer = self.V[x]
+        self.pc += 2
+
+    def _op_ld_st_vx(self, x):  # FX18
+        self.sound_timer = self.V[x]
+        self.pc += 2
+
+    def _op_add_i_vx(self, x):  # FX1E
+        self.I += self.V[x]
+        self.pc += 2
+
+    def _op_ld_f_vx(self, x):  # FX29
+        self.I = FONT_ADDR + (self.V[x] * 5)
+        self.pc += 2
+
+    def _op_ld_hf_vx(self, x):  # FX30 (SCHIP big digit)
+        self.I = BIGFONT_ADDR + (self.V[x] & 0xF) * 10
+        self.pc += 2
+
+    def _op_ld_b_vx(self, x):  # FX33 (BCD)
+        value = self.V[x]
+        self.memory[self.I]     = value // 100
+        self.memory[self.I + 1] = (value // 10) % 10
+        self.memory[self.I + 2] = value % 10
+        self.invalidate(self.I, 3)
+        self.pc += 2
+
+    def _op_ld_i_vx(self, x):  # FX55
+        for i in range(x + 1):
+            self.memory[self.I + i] = self.V[i]
+        self.invalidate(self.I, x + 1)
+        self.pc += 2
+
+    def _op_ld_vx_i(self, x):  # FX65
+        for i in range(x + 1):
+            self.V[i] = self.memory[self.I + i]
+        self.pc += 2
+
+    def _op_ld_i_vx_inc(self, increment, x):  # FX55 (memory quirk: I moves past the registers)
+        self._op_ld_i_vx(x)
+        self.I += x + increment
+
+    def _op_ld_vx_i_inc(self, increment, x):  # FX65 (memory quirk)
+        self._op_ld_vx_i(x)
+        self.I += x + increment
+
+    def _op_ld_r_vx(self, x):  # FX75 (SCHIP: save V0-VX to the RPL flags)
+        self.flags[:x + 1] = self.V[:x + 1]
+        self.pc += 2
+
+    def _op_ld_vx_r(self, x):  # FX85
+        self.V[:x + 1] = self.flags[:x + 1]
+        self.pc += 2
+
+    # --- XO-CHIP ---
+
+    def _op_skip_long(self, skip):
+        pc = self.pc
+        skip()
+        if self.pc == pc + 4 and self.memory[pc + 2] == 0xF0 and self.memory[pc + 3] == 0x00:
+            self.pc += 2
+
+    def _op_save_range(self, x, y):  # 5XY2: VX..VY to memory at I (either order), I unchanged
+        registers = range(x, y + 1) if x <= y else range(x, y - 1, -1)
+        for i, r in enumerate(registers):
+            self.memory[self.I + i] = self.V[r]
+        self.invalidate(self.I, len(registers))
+        self.pc += 2
+
+    def _op_load_range(self, x, y):  # 5XY3
+        registers = range(x, y + 1) if x <= y else range(x, y - 1, -1)
+        for i, r in enumerate(registers):
+            self.V[r] = self.memory[self.I + i]
+        self.pc += 2
+
+    def _op_ld_i_long(self):  # F000 NNNN
+        self.I = (self.memory[self.pc + 2] << 8) | self.memory[self.pc + 3]
+        self.pc += 4
+
+    def _op_plane(self, n):  # FN01
+        self.set_planes(n & 3)
+        self.pc += 2
+
+    def _op_audio(self):  # F002: 16-byte pattern at I
+        self.audio.set_pattern(self.memory[self.I:self.I + 16])
+        self.pc += 2
+
+    def _op_pitch(self, x):  # FX3A
+        self.audio.set_pitch(self.V[x])
+        self.pc += 2
+
+
+def _shift_bytes(buffer, shift, width=0):
+    """Move buffer's bytes `shift` places towards its end (negative: start), zero-filling.
+
+    With a row width, the columns that crossed a row boundary are blanked
+    too, so the move acts on each row separately.
+    """
+    size = len(buffer)
+    if abs(shift) >= size:
+        buffer[:] = bytes(size)
+    elif shift > 0:
+        buffer[shift:] = buffer[:size - shift]
+        buffer[:shift] = bytes(shift)
+    elif shift < 0:
+        buffer[:shift] = buffer[-shift:]
+        buffer[shift:] = bytes(-shift)
+    if width:
+        rows = size // width
+        columns = range(shift) if shift > 0 else range(width + shift, width)
+        for col in columns:
+            buffer[col::width] = bytes(rows)
+
+
+class TracedChip8(Chip8):
+    """Chip8 that records each instruction before running it.
+
+    Chip8.set_trace swaps an instance to this class, so the untraced
+    emulation_cycle does not pay for any tracing check.
+    """
+
+    __slots__ = ()
+
+    def emulation_cycle(self):
+        opcode = (self.memory[self.pc] << 8) | self.memory[self.pc + 1]
+        self.trace.record(self.pc, opcode, self.V)
+        if self.trace_print:
+            from disasm import decode_opcode
+            print(f"{self.pc:03X}: {opcode:04X}  {decode_opcode(opcode, self.quirks)}")
+        super().emulation_cycle()
@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from chip8 import Chip8
+from quirks import PROFILES, DEFAULT_QUIRKS
+from scheduler import FrameScheduler, DEFAULT_IPS
+from replay import InputLog, set_keys, rom_hash
+from batch import find_roms
+
+ENGINES = ["jit", "idle", "jit+idle", "vector"]
+DEFAULT_ENGINES = ["jit", "idle", "jit+idle"]
+DEFAULT_FRAMES = 600
+DEFAULT_EVERY = 64            # Instructions between two comparisons
+DEFAULT_BUDGET = 10.0         # Seconds per ROM and engine
+KEY_HOLD = 20                 # Random keys: frames each key (or no key) is held
+
+
+def machine_state(chip8):
+    """What the checker compares; the display and memory as they are, see state_diff()"""
+    return {
+        "pc": chip8.pc,
+        "I": chip8.I,
+        "V": bytes(chip8.V),
+        "stack": tuple(chip8.stack[:chip8.sp]),
+        "delay_timer": chip8.delay_timer,
+        "sound_timer": chip8.sound_timer,
+        "display": bytes(chip8.display),
+        "memory": bytes(chip8.memory),
+    }
+
+
+def state_diff(reference, candidate):
+    """Human-readable lines for the fields that differ"""
+    lines = []
+    for field, expected in reference.items():
+        got = candidate[field]
+        if got == expected:
+            continue
+        if field == "V":
+            regs = [f"V{r:X} {a:02X}→{b:02X}" for r, (a, b) in enumerate(zip(expected, got)) if a != b]
+            lines.append("V: " + ", ".join(regs))
+        elif field == "memory":
+            diffs = [addr for addr, (a, b) in enumerate(zip(expected, got)) if a != b]
+            if len(expected) != len(got):
+                lines.append(f"memory: {len(expected)} → {len(got)} bytes")
+            if diffs:
+                addr = diffs[0]
+                lines.append(f"memory: {len(diffs)} bytes differ, first at {addr:03X} "
+                             f"({expected[addr]:02X}→{got[addr]:02X})")
+        elif field == "display":
+            lines.append(f"display: SHA-1 {hashlib.sha1(expected).hexdigest()[:12]}"
+                         f"→{hashlib.sha1(got).hexdigest()[:12]}")
+        elif field == "stack":
+            lines.append("stack: " + (" ".join(f"{a:03X}" for a in expected) or "-") +
+                         " → " + (" ".join(f"{a:03X}" for a in got) or "-"))
+        else:
+            lines.append(f"{field}: {expected:X}→{got:X}")
+    return lines
+
+
+class Lockstep:
+    """The reference interpreter and a candidate engine, given the same ROM, seed and keys.
+
+    The reference is a Chip8 stepped one emulation_cycle() at a time. The
+    candidate is a Chip8 run through the JIT and/or the idle detector, or
+    machine 0 of a VectorChip8 ("vector"). Both are driven through
+    FrameScheduler with the same instruction counts per call.
+    """
+
+    def __init__(self, rom_file, engine, seed=0, ips=DEFAULT_IPS, quirks=DEFAULT_QUIRKS):
+        self.reference = Chip8(sound=False, seed=seed, quirks=quirks)
+        self.reference.load_program(rom_file)
+        self.ref_scheduler = FrameScheduler(self.reference, ips, idle=False)
+        if engine == "vector":
+            from vector import VectorChip8    # NumPy
+            if quirks != DEFAULT_QUIRKS:
+                raise ValueError(f"The vector engine only runs the {DEFAULT_QUIRKS} quirks")
+            self.candidate = VectorChip8(1, seeds=[seed])
+            self.cand_scheduler = FrameScheduler(self.candidate, ips, idle=False)
+        else:
+            self.candidate = Chip8(sound=False, seed=seed, quirks=quirks)
+            self.cand_scheduler = FrameScheduler(self.candidate, ips, jit="jit" in engine,
+                                                 idle="idle" in engine)
+        self.candidate.load_program(rom_file)
+        self.cycles_per_frame = self.ref_scheduler.cycles_per_frame
+        self.executed = 0             # Instructions run by each side
+
+    def set_keys(self, mask):
+        set_keys(self.reference.key, mask)
+        if isinstance(self.candidate, Chip8):
+            set_keys(self.candidate.key, mask)
+        else:
+            self.candidate.key[0] = [(mask >> k) & 1 for k in range(16)]
+
+    def run(self, cycles):
+        self.ref_scheduler.run(cycles)
+        self.cand_scheduler.run(cycles)
+        self.executed += cycles
+
+    def end_frame(self):
+        self.ref_scheduler.end_frame()
+        self.cand_scheduler.end_frame()
+
+    def states(self):
+        candidate = self.candidate
+        if not isinstance(candidate, Chip8):
+            candidate = candidate.to_chip8(0)
+        return machine_state(self.reference), machine_state(candidate)
+
+
+def random_keys(seed, frames):
+    """Key changes {frame: mask}: every KEY_HOLD frames, one random key held or none"""
+    rng = random.Random(seed)
+    changes = {}
+    for frame in range(0, frames, KEY_HOLD):
+        key = rng.randrange(17)           # 16 = no key
+        changes[frame] = 1 << key if key < 16 else 0
+    return changes
+
+
+def checkpoints(pair, frames, every, keys, split=None):
+    """Drive `pair` frame by frame; yields (frame, event) after every comparison point.
+
+    event is "run" after a batch of at most `every` instructions, "tick"
+    after the timers. With split=(start, count), the batch that starts at
+    instruction `start` runs `count` instructions instead and the
+    generator stops there (see locate()).
+    """
+    for frame in range(frames):
+        mask = keys.get(frame)
+        if mask is not None:
+            pair.set_keys(mask)
+        left = pair.cycles_per_frame
+        while left:
+            count = min(every, left)
+            if split is not None and pair.executed == split[0]:
+                pair.run(split[1])
+                yield frame, "run"
+                return
+            pair.run(count)
+            left -= count
+            yield frame, "run"
+        pair.end_frame()
+        yield frame, "tick"
+
+
+def locate(make_pair, frames, every, keys, start, length):
+    """Find the first instruction of a diverging batch whose result differs.
+
+    Replays from the beginning, bisecting on how many instructions of the
+    batch starting at `start` run (the batch's first `length` end in a
+    mismatch). Returns (lo pair, hi pair): the states just before and
+    just after the first diverging instruction.
+    """
+    def replay(count):
+        pair = make_pair()
+        for _ in checkpoints(pair, frames, every, keys, split=(start, count)):
+            pass
+        return pair
+
+    lo, hi = 0, length
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        reference, candidate = replay(mid).states()
+        if reference == candidate:
+            lo = mid
+        else:
+            hi = mid
+    return replay(lo), replay(hi)
+
+
+def check_rom(rom_file, engine, frames=DEFAULT_FRAMES, every=DEFAULT_EVERY, seed=0, ips=DEFAULT_IPS,
+              quirks=DEFAULT_QUIRKS, log_file=None, budget=DEFAULT_BUDGET):
+    """Run `engine` against the reference on one ROM; never raises.
+
+    With log_file, the seed, speed, quirks, length and keys come from an
+    input log (see replay.py); otherwise keys are random_keys(seed).
+    Stops at the first mismatch, or when `budget` seconds are spent.
+    Returns a dict: status is "ok", "mismatch", "budget", "skipped" or "error".
+    """
+    row = {"rom": rom_file, "engine": engine, "status": "ok", "instructions": 0,
+           "checkpoints": 0, "elapsed": 0.0, "mismatch": None, "error": ""}
+    start = time.perf_counter()
+    try:
+        if log_file is not None:
+            log = InputLog.load(log_file)
+            if rom_hash(rom_file) != log.rom_sha1:
+                raise ValueError(f"{rom_file} is not the ROM this log was recorded with")
+            seed, ips, quirks, frames = log.seed, log.ips, log.quirks, log.frames
+            keys = dict(log.events)
+        else:
+            if quirks == "auto":
+                from library import suggest_quirks
+                quirks = suggest_quirks(rom_file)
+            keys = random_keys(seed, frames)
+        if engine == "vector" and quirks != DEFAULT_QUIRKS:
+            row.update(status="skipped", error=f"{quirks} quirks (vector runs {DEFAULT_QUIRKS} only)")
+            return row
+
+        def make_pair():
+            return Lockstep(rom_file, engine, seed, ips, quirks)
+
+        pair = make_pair()
+        good = 0                  # Instructions run at the last matching comparison
+        for frame, event in checkpoints(pair, frames, every, keys):
+            row["checkpoints"] += 1
+            reference, candidate = pair.states()
+            if reference != candidate:
+                row["status"] = "mismatch"
+                row["mismatch"] = _describe(make_pair, frames, every, keys, frame, event,
+                                            good, pair.executed - good, reference, candidate)
+                break
+            good = pair.executed
+            if time.perf_counter() - start > budget:
+                row["status"] = "budget"
+                break
+        row["instructions"] = good
+    except Exception as e:
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+    row["elapsed"] = time.perf_counter() - start
+    return row
+
+
+def _describe(make_pair, frames, every, keys, frame, event, start, length, reference, candidate):
+    """Mismatch report: the first diverging instruction (or timer tick) and the state diff"""
+    if event == "tick" or length == 0:
+        return {"frame": frame, "instruction": start, "pc": reference["pc"], "opcode": None,
+                "text": "timer tick", "diff": state_diff(reference, candidate)}
+    before, after = locate(make_pair, frames, every, keys, start, length)
+    pc = before.reference.pc
+    memory = before.reference.memory
+    opcode = (memory[pc] << 8) | memory[pc + 1]
+    from disasm import decode_opcode
+    return {"frame": frame, "instruction": after.executed, "pc": pc, "opcode": opcode,
+            "text": decode_opcode(opcode, before.reference.quirks), "diff": state_diff(*after.states())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fast engines against the reference interpreter")
+    parser.add_argument("roms", help="ROM file, directory or glob pattern (quote it)")
+    parser.add_argument("--engine", action="append", choices=ENGINES,
+                        help=f"engine to check, may be repeated (default {' '.join(DEFAULT_ENGINES)})")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES,
+                        help=f"60 Hz frames per ROM (default {DEFAULT_FRAMES})")
+    parser.add_argument("--every", type=int, default=DEFAULT_EVERY,
+                        help=f"instructions between two comparisons (default {DEFAULT_EVERY})")
+    parser.add_argument("--ips", type=int, default=DEFAULT_IPS, help="instructions per second")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the CXNN numbers and random keys")
+    parser.add_argument("--quirks", choices=["auto", *PROFILES], default=DEFAULT_QUIRKS,
+                        help=f"quirk profile (default {DEFAULT_QUIRKS})")
+    parser.add_argument("--log", metavar="FILE",
+                        help="input log (--record) to take the keys and settings from; one ROM only")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help=f"seconds per ROM and engine before stopping (default {DEFAULT_BUDGET:g})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    roms = [args.roms] if os.path.isfile(args.roms) else find_roms(args.roms)
+    if not roms:
+        print(f"❌ No ROM found for {args.roms}")
+        sys.exit(1)
+    if args.log and len(roms) > 1:
+        print("❌ --log needs a single ROM")
+        sys.exit(1)
+    engines = args.engine or DEFAULT_ENGINES
+
+    jobs = [(rom, engine) for rom in roms for engine in engines]
+    print(f"🔍 Checking {len(engines)} engine(s) on {len(roms)} ROM(s)...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+        futures = [pool.submit(check_rom, rom, engine, args.frames, args.every, args.seed, args.ips,
+                               args.quirks, args.log, args.budget) for rom, engine in jobs]
+        rows = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    for row in rows:
+        name = f"{row['rom']} [{row['engine']}]"
+        checked = f"{row['instructions']:,} instructions, {row['checkpoints']} checks, {row['elapsed']:.2f}s"
+        if row["status"] == "ok":
+            print(f"  ✅ {name:<44} {checked}")
+        elif row["status"] == "budget":
+            print(f"  ⏱️  {name:<44} budget reached after {checked}")
+        elif row["status"] == "skipped":
+            print(f"  ⏭️  {name:<44} skipped: {row['error']}")
+        elif row["status"] == "error":
+            print(f"  ⚠️  {name:<44} {row['error']}")
+        else:
+            m = row["mismatch"]
+            where = f"PC={m['pc']:03X} {m['opcode']:04X} {m['text']}" if m["opcode"] is not None else m["text"]
+            print(f"  ❌ {name:<44} first mismatch at instruction {m['instruction']:,} "
+                  f"(frame {m['frame']}): {where}")
+            for line in m["diff"]:
+                print(f"       {line}")
+
+    total = sum(row["instructions"] for row in rows)
+    failed = sum(row["status"] in ("mismatch", "error") for row in rows)
+    print(f"📄 {total:,} instructions checked in {elapsed:.2f}s ({total / elapsed:,.0f}/s), "
+          f"{failed} of {len(rows)} runs failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import argparse
+import sys
+
+import numpy as np
+
+from quirks import INSTRUCTION_SETS, PROFILES, instruction_set
+
+# How an instruction passes control on
+NEXT = 0        # Falls through to PC+2
+JUMP = 1        # 1NNN
+CALL = 2        # 2NNN (returns to PC+2)
+RET = 3         # 00EE
+SKIP = 4        # Goes to PC+2 or PC+4
+INDIRECT = 5    # BNNN: target only known at run time
+INVALID = 6     # Unknown opcode
+LONG = 7        # F000 NNNN: falls through to PC+4
+
+# (mask, value, mnemonic template, flow). Earlier entries win over later ones.
+# They decode what Chip8.decode does with every extension on; kind_table()
+# narrows them down to one quirk profile.
+INSTRUCTIONS = [
+    (0xF0FF, 0x00E0, "CLS", NEXT),        # Like the original interpreter, X is ignored
+    (0xF0FF, 0x00EE, "RET", RET),
+    (0xFFF0, 0x00C0, "SCD {n:X}", NEXT),
+    (0xFFF0, 0x00D0, "SCU {n:X}", NEXT),
+    (0xFFFF, 0x00FB, "SCR", NEXT),
+    (0xFFFF, 0x00FC, "SCL", NEXT),
+    (0xFFFF, 0x00FD, "EXIT", RET),
+    (0xFFFF, 0x00FE, "LOW", NEXT),
+    (0xFFFF, 0x00FF, "HIGH", NEXT),
+    (0xF000, 0x1000, "JP {nnn:03X}", JUMP),
+    (0xF000, 0x2000, "CALL {nnn:03X}", CALL),
+    (0xF000, 0x3000, "SE V{x:X}, {nn:02X}", SKIP),
+    (0xF000, 0x4000, "SNE V{x:X}, {nn:02X}", SKIP),
+    (0xF00F, 0x5002, "LD [I], V{x:X}-V{y:X}", NEXT),
+    (0xF00F, 0x5003, "LD V{x:X}-V{y:X}, [I]", NEXT),
+    (0xF000, 0x5000, "SE V{x:X}, V{y:X}", SKIP),
+    (0xF000, 0x6000, "LD V{x:X}, {nn:02X}", NEXT),
+    (0xF000, 0x7000, "ADD V{x:X}, {nn:02X}", NEXT),
+    (0xF00F, 0x8000, "LD V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8001, "OR V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8002, "AND V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8003, "XOR V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8004, "ADD V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8005, "SUB V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8006, "SHR V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x8007, "SUBN V{x:X}, V{y:X}", NEXT),
+    (0xF00F, 0x800E, "SHL V{x:X}, V{y:X}", NEXT),
+    (0xF000, 0x9000, "SNE V{x:X}, V{y:X}", SKIP),
+    (0xF000, 0xA000, "LD I, {nnn:03X}", NEXT),
+    (0xF000, 0xB000, "JP V0, {nnn:03X}", INDIRECT),
+    (0xF000, 0xB000, "JP V{x:X}, {nnn:03X}", INDIRECT),      # jumping quirk "vx", see kind_table()
+    (0xF000, 0xC000, "RND V{x:X}, {nn:02X}", NEXT),
+    (0xF00F, 0xD000, "DRW V{x:X}, V{y:X}, 16x16", NEXT),
+    (0xF000, 0xD000, "DRW V{x:X}, V{y:X}, {n:X}", NEXT),
+    (0xF0FF, 0xE09E, "SKP V{x:X}", SKIP),
+    (0xF0FF, 0xE0A1, "SKNP V{x:X}", SKIP),
+    (0xFFFF, 0xF000, "LD I, LONG", LONG),
+    (0xFFFF, 0xF002, "AUDIO", NEXT),
+    (0xF0FF, 0xF001, "PLANE {x:X}", NEXT),
+    (0xF0FF, 0xF007, "LD V{x:X}, DT", NEXT),
+    (0xF0FF, 0xF00A, "LD V{x:X}, K", NEXT),
+    (0xF0FF, 0xF015, "LD DT, V{x:X}", NEXT),
+    (0xF0FF, 0xF018, "LD ST, V{x:X}", NEXT),
+    (0xF0FF, 0xF01E, "ADD I, V{x:X}", NEXT),
+    (0xF0FF, 0xF029, "LD F, V{x:X}", NEXT),
+    (0xF0FF, 0xF030, "LD HF, V{x:X}", NEXT),
+    (0xF0FF, 0xF033, "LD B, V{x:X}", NEXT),
+    (0xF0FF, 0xF03A, "PITCH V{x:X}", NEXT),
+    (0xF0FF, 0xF055, "LD [I], V{x:X}", NEXT),
+    (0xF0FF, 0xF065, "LD V{x:X}, [I]", NEXT),
+    (0xF0FF, 0xF075, "LD R, V{x:X}", NEXT),
+    (0xF0FF, 0xF085, "LD V{x:X}, R", NEXT),
+]
+UNKNOWN = len(INSTRUCTIONS)
+TEMPLATES = [t for _, _, t, _ in INSTRUCTIONS] + ["UNKNOWN {op:04X}"]
+FLOWS = np.array([f for _, _, _, f in INSTRUCTIONS] + [INVALID], dtype=np.uint8)
+
+
+def _build_kind_table():
+    """KIND[opcode] = index into INSTRUCTIONS (UNKNOWN if none matches)"""
+    ops = np.arange(0x10000, dtype=np.uint32)
+    kind = np.full(0x10000, UNKNOWN, dtype=np.uint8)
+    for index in reversed(range(len(INSTRUCTIONS))):
+        mask, value, _, _ = INSTRUCTIONS[index]
+        kind[(ops & mask) == value] = index
+    return kind
+
+
+KIND = _build_kind_table()
+JUMPS = {"v0": TEMPLATES.index("JP V0, {nnn:03X}"), "vx": TEMPLATES.index("JP V{x:X}, {nnn:03X}")}
+_kind_tables = {}                 # Quirk profile name -> KIND as that profile decodes
+
+
+def kind_table(quirks=None):
+    """KIND for a quirk profile (quirks.Quirks): opcodes outside its instruction
+    set are UNKNOWN and BNNN follows its jumping quirk, as in Chip8.decode.
+    With no profile, every extension is decoded and BNNN is JP V0.
+    """
+    if quirks is None:
+        return KIND
+    kind = _kind_tables.get(quirks.name)
+    if kind is None:
+        levels = _kind_tables.get(None)
+        if levels is None:
+            levels = _kind_tables[None] = np.array(
+                [INSTRUCTION_SETS.index(instruction_set(op)) for op in range(0x10000)], dtype=np.uint8)
+        kind = KIND.copy()
+        kind[levels > INSTRUCTION_SETS.index(quirks.opcodes)] = UNKNOWN
+        kind[0xB000:0xC000] = JUMPS.get(quirks.jumping, UNKNOWN)
+        _kind_tables[quirks.name] = kind
+    return kind
+
+
+def decode_opcode(opcode, quirks=None):
+    """Mnemonic of a single opcode, e.g. 0x6A42 -> "LD VA, 42" (see kind_table for `quirks`)"""
+    return TEMPLATES[kind_table(quirks)[opcode]].format(
+        op=opcode, x=(opcode >> 8) & 0xF, y=(opcode >> 4) & 0xF,
+        n=opcode & 0xF, nn=opcode & 0xFF, nnn=opcode & 0xFFF)
+
+
+def decode_all(rom):
+    """Opcode at every byte offset of `rom` (last offset padded with 0).
+
+    Returns a uint16 array; opcodes[i] is the instruction that would run
+    with PC at offset i, so unaligned code paths can be followed too.
+    """
+    data = np.frombuffer(bytes(rom) + b"\x00", dtype=np.uint8).astype(np.uint16)
+    return (data[:-1] << 8) | data[1:]
+
+
+def disassemble_linear(rom, base=0x200, quirks=None):
+    """(address, opcode, mnemonic) for every aligned word, like the old decript.py"""
+    rom = bytes(rom)
+    ops = np.frombuffer(rom[:len(rom) & ~1], dtype=">u2")
+    # Each distinct opcode is formatted once, then mapped back to every occurrence
+    unique, inverse = np.unique(ops, return_inverse=True)
+    text = [decode_opcode(int(op), quirks) for op in unique]
+    return [(base + 2 * i, int(op), text[j])
+            for i, (op, j) in enumerate(zip(ops.tolist(), inverse.tolist()))]
+
+
+class Analysis:
+    """Result of following the control flow of a ROM"""
+
+    def __init__(self, base, size):
+        self.base = base
+        self.size = size
+        self.code = set()          # Addresses where an instruction starts
+        self.labels = set()        # Jump/call/skip targets
+        self.calls = set()         # Subroutine entry points
+        self.indirect = set()      # BNNN sites (targets unknown)
+        self.invalid = set()       # Unknown opcodes reached by the flow
+        self.blocks = {}           # Basic block start -> (end, successors)
+
+
+def analyze(rom, base=0x200, entry=None, quirks=None):
+    """Follow jumps, calls and skips from the entry point to tell code from data
+    (decoded as the `quirks` profile does, see kind_table)"""
+    rom = bytes(rom)
+    opcodes = decode_all(rom)
+    kinds = kind_table(quirks)[opcodes]
+    flows = FLOWS[kinds].tolist()
+    opcodes = opcodes.tolist()
+    end = base + len(rom)
+
+    result = Analysis(base, len(rom))
+    entry = base if entry is None else entry
+    result.labels.add(entry)
+    worklist = [entry]
+
+    while worklist:
+        addr = worklist.pop()
+        while base <= addr < end - 1 and addr not in result.code:
+            result.code.add(addr)
+            offset = addr - base
+            flow = flows[offset]
+            nnn = opcodes[offset] & 0xFFF
+            if flow == NEXT:
+                addr += 2
+            elif flow == LONG:
+                addr += 4
+            elif flow == JUMP:
+                result.labels.add(nnn)
+                worklist.append(nnn)
+                break
+            elif flow == CALL:
+                result.labels.add(nnn)
+                result.calls.add(nnn)
+                result.labels.add(addr + 2)
+                worklist.append(nnn)
+                addr += 2
+            elif flow == SKIP:
+                skipped = addr + (6 if offset + 2 < len(flows) and flows[offset + 2] == LONG else 4)
+                result.labels.update((addr + 2, skipped))
+                worklist.append(skipped)
+                addr += 2
+            elif flow == INDIRECT:
+                result.indirect.add(addr)
+                break
+            else:                  # RET or INVALID
+                if flow == INVALID:
+                    result.invalid.add(addr)
+                break
+
+    _build_blocks(result, flows, opcodes)
+    return result
+
+
+def _build_blocks(result, flows, opcodes):
+    """Split the code into basic blocks"""
+    base = result.base
+    for start in sorted(a for a in result.labels if a in result.code):
+        addr = start
+        while True:
+            offset = addr - base
+            flow = flows[offset]
+            nxt = addr + (4 if flow == LONG else 2)
+            if flow == JUMP:
+                successors = [opcodes[offset] & 0xFFF]
+            elif flow == CALL:
+                successors = [opcodes[offset] & 0xFFF, nxt]
+            elif flow == SKIP:
+                skipped = addr + (6 if offset + 2 < len(flows) and flows[offset + 2] == LONG else 4)
+                successors = [nxt, skipped]
+            elif flow in (RET, INDIRECT, INVALID):
+                successors = []
+            elif nxt in result.labels or nxt not in result.code:
+                successors = [nxt] if nxt in result.code else []
+            else:
+                addr = nxt
+                continue
+            result.blocks[start] = (nxt, successors)
+            break
+
+
+def listing(rom, base=0x200, analysis=None, quirks=None):
+    """Disassembly lines: instructions where the flow reaches, data bytes elsewhere"""
+    rom = bytes(rom)
+    analysis = analysis or analyze(rom, base, quirks=quirks)
+    opcodes = decode_all(rom).tolist()
+    lines = []
+    addr = base
+    end = base + len(rom)
+    while addr < end:
+        if addr in analysis.code:
+            if addr in analysis.labels:
+                kind = "sub" if addr in analysis.calls else "L"
+                lines.append(f"{kind}_{addr:03X}:")
+            opcode = opcodes[addr - base]
+            if opcode == 0xF000 and addr + 3 < end:
+                long = opcodes[addr + 2 - base]
+                lines.append(f"{addr:03X}: F000 {long:04X}  LD I, {long:04X}")
+                addr += 4
+                continue
+            lines.append(f"{addr:03X}: {opcode:04X}  {decode_opcode(opcode, quirks)}")
+            addr += 2
+        else:
+            lines.append(f"{addr:03X}: {rom[addr - base]:02X}    DB {rom[addr - base]:02X}")
+            addr += 1
+    return lines
+
+
+def prewarm(chip8, base=0x200, size=None):
+    """Fill the emulator's decode cache for every reachable instruction of the loaded ROM
+    (`size` bytes long; without it, all of memory from `base` is searched)"""
+    image = chip8.memory[base:base + size] if size else chip8.memory[base:]
+    analysis = analyze(image, base, quirks=chip8.quirks)
+    chip8.prewarm(sorted(analysis.code))
+    return analysis
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chip-8 disassembler")
+    parser.add_argument("rom", help="ROM file")
+    parser.add_argument("-o", "--output", help="write the listing to a file instead of stdout")
+    parser.add_argument("--linear", action="store_true",
+                        help="decode every aligned word, without telling code from data")
+    parser.add_argument("--quirks", choices=PROFILES,
+                        help="decode as this profile does (default: every extension, BNNN as JP V0)")
+    args = parser.parse_args()
+    quirks = PROFILES[args.quirks] if args.quirks else None
+
+    with open(args.rom, "rb") as f:
+        rom = f.read()
+
+    if args.linear:
+        lines = [f"{addr:03X}: {op:04X}  {text}" for addr, op, text in disassemble_linear(rom, quirks=quirks)]
+        summary = f"Decoded {len(lines)} instructions"
+    else:
+        analysis = analyze(rom, quirks=quirks)
+        lines = listing(rom, analysis=analysis, quirks=quirks)
+        summary = (f"{len(analysis.code)} instructions in {len(analysis.blocks)} blocks, "
+                   f"{len(rom) - 2 * len(analysis.code)} data bytes")
+        if analysis.indirect:
+            summary += f", {len(analysis.indirect)} indirect jump(s) not followed"
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"{summary} into {args.output}")
+    else:
+        print("\n".join(lines))
+        print(f"; {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
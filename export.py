@@ -0,0 +1,388 @@
+import argparse
+import os
+import queue
+import re
+import shutil
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from chip8 import PALETTE, HIRES
+from scheduler import TIMER_HZ
+
+QUEUE_FRAMES = 256            # Changed frames waiting for the writer; capture() drops beyond that
+DEFAULT_SCALE = 4             # PNG/GIF: image pixels per hi-res pixel (lo-res pixels are twice as big)
+MIN_GIF_DELAY = 2             # Centiseconds; viewers slow down anything shorter to 0.1 s
+
+# .c8v layout: RAW_HEADER, then a RAW_RECORD + payload per changed frame,
+# and a RAW_END record holding the total number of frames
+RAW_MAGIC = b"C8VD"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct(">4sBB")          # magic, version, frames per second
+RAW_RECORD = struct.Struct(">BIHHBI")        # kind, frame number, width, height, bits per pixel, payload size
+RAW_FRAME, RAW_END = 0, 1
+RLE_TOKEN = struct.Struct(">HH")             # zero bytes to skip, literal bytes that follow
+_LITERAL = re.compile(rb"[^\x00]+(?:\x00{1,3}[^\x00]+)*")   # Short zero gaps stay in the literal
+
+
+def rle_encode(data):
+    """Zero runs and literals; trailing zeros are left out (the reader knows the size)"""
+    out = []
+    pos = 0
+    for match in _LITERAL.finditer(data):
+        out.append(RLE_TOKEN.pack(match.start() - pos, match.end() - match.start()))
+        out.append(match.group())
+        pos = match.end()
+    return b"".join(out)
+
+
+def rle_decode(payload, size):
+    out = bytearray(size)
+    pos = offset = 0
+    while offset < len(payload):
+        skip, count = RLE_TOKEN.unpack_from(payload, offset)
+        offset += RLE_TOKEN.size
+        pos += skip
+        out[pos:pos + count] = payload[offset:offset + count]
+        pos += count
+        offset += count
+    return bytes(out)
+
+
+def pack(pixels, depth):
+    """Display bytes -> bit plane 1 packed 8 pixels per byte, then plane 2 if depth is 2"""
+    planes = [np.packbits(pixels & 1)]
+    if depth == 2:
+        planes.append(np.packbits(pixels >> 1 & 1))
+    return np.concatenate(planes)
+
+
+def unpack(packed, size, depth):
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8))
+    pixels = bits[:size].copy()
+    if depth == 2:
+        pixels |= bits[size:2 * size] << 1
+    return pixels
+
+
+def render(display, width, height, scale):
+    """Palette indices of a frame at a fixed size: `scale` image pixels per hi-res pixel"""
+    image = np.frombuffer(display, dtype=np.uint8).reshape(height, width)
+    factor = HIRES[0] // width * scale
+    return image.repeat(factor, axis=0).repeat(factor, axis=1)
+
+
+class RawWriter:
+    """1-bit packed frames (2 bits once an XO-CHIP pixel uses plane 2), each stored
+    as the run-length coded XOR with the previous frame; see read_raw()"""
+
+    def __init__(self, filename, scale=None):
+        self.file = open(filename, "wb")
+        self.file.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, TIMER_HZ))
+        self.previous = None          # (width, height, depth, packed) of the last frame
+
+    def frame(self, number, width, height, display):
+        pixels = np.frombuffer(display, dtype=np.uint8)
+        depth = 2 if (pixels > 1).any() else 1
+        packed = pack(pixels, depth)
+        delta = packed
+        if self.previous is not None and self.previous[:3] == (width, height, depth):
+            delta = packed ^ self.previous[3]
+        payload = rle_encode(delta.tobytes())
+        self.file.write(RAW_RECORD.pack(RAW_FRAME, number, width, height, depth, len(payload)))
+        self.file.write(payload)
+        self.previous = (width, height, depth, packed)
+
+    def close(self, frames):
+        try:
+            self.file.write(RAW_RECORD.pack(RAW_END, frames, 0, 0, 0, 0))
+        finally:
+            self.file.close()
+
+
+def read_raw(filename):
+    """Every frame of a .c8v file, unchanged ones repeated: yields (width, height, display bytes)"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    magic, version, _ = RAW_HEADER.unpack_from(data)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise ValueError("Not a Chip-8 video stream (or unsupported version)")
+    offset = RAW_HEADER.size
+    previous = None                   # (width, height, depth, packed)
+    frame = None                      # (width, height, display) being shown
+    shown = 0                         # Frames yielded so far
+    while True:
+        kind, number, width, height, depth, size = RAW_RECORD.unpack_from(data, offset)
+        offset += RAW_RECORD.size
+        for _ in range(shown, number):
+            yield frame
+        shown = number
+        if kind == RAW_END:
+            return
+        pixels = width * height
+        packed = np.frombuffer(rle_decode(data[offset:offset + size], pixels * depth // 8), dtype=np.uint8)
+        offset += size
+        if previous is not None and previous[:3] == (width, height, depth):
+            packed = packed ^ previous[3]
+        previous = (width, height, depth, packed)
+        frame = (width, height, unpack(packed, pixels, depth).tobytes())
+
+
+class PngWriter:
+    """One indexed-color PNG per frame: out.png -> out_00000.png, out_00001.png...
+    An unchanged frame is a hard link to the previous file."""
+
+    def __init__(self, filename, scale=DEFAULT_SCALE):
+        path = Path(filename)
+        self.pattern = str(path.with_name(path.stem + "_{:05d}" + path.suffix))
+        self.scale = scale
+        self.last = None              # (frame number, path) of the last file written
+
+    def frame(self, number, width, height, display):
+        self._repeat(number)
+        path = self.pattern.format(number)
+        _remove(path)                 # It may be a link into an older sequence
+        with open(path, "wb") as f:
+            f.write(png_bytes(render(display, width, height, self.scale)))
+        self.last = (number, path)
+
+    def _repeat(self, until):
+        if self.last is None:
+            return
+        number, source = self.last
+        for n in range(number + 1, until):
+            path = self.pattern.format(n)
+            _remove(path)
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)   # No hard links on this file system
+
+    def close(self, frames):
+        self._repeat(frames)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def png_bytes(image):
+    """8-bit indexed PNG of palette indices"""
+    height, width = image.shape
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = np.hstack([np.zeros((height, 1), dtype=np.uint8), image])   # Filter type 0 on each row
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", bytes(c for color in PALETTE for c in color)),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
+class GifWriter:
+    """Looping animated GIF. Each GIF frame only redraws the rectangle that
+    changed since the previous one; frames closer than MIN_GIF_DELAY are merged."""
+
+    def __init__(self, filename, scale=DEFAULT_SCALE):
+        self.scale = scale
+        width, height = HIRES[0] * scale, HIRES[1] * scale
+        self.canvas = None            # Image the GIF shows so far
+        self.pending = None           # (frame number, image) not written yet
+        self.file = open(filename, "wb")
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0x91, 0, 0))
+        self.file.write(bytes(c for color in PALETTE for c in color))      # 4-color global table
+        self.file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")    # Loop forever
+
+    def frame(self, number, width, height, display):
+        image = render(display, width, height, self.scale)
+        if self.pending is not None:
+            start, pending = self.pending
+            if _centiseconds(number) - _centiseconds(start) < MIN_GIF_DELAY:
+                self.pending = (start, image)   # Too soon: this frame replaces the pending one
+                return
+            self._write(pending, _centiseconds(number) - _centiseconds(start))
+        self.pending = (number, image)
+
+    def _write(self, image, delay):
+        if self.canvas is None:
+            changed = np.ones(image.shape, dtype=bool)   # The first frame covers the whole screen
+        else:
+            changed = image != self.canvas
+        rows = np.flatnonzero(changed.any(axis=1))
+        columns = np.flatnonzero(changed.any(axis=0))
+        if len(rows):
+            top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        else:
+            top, bottom, left, right = 0, 1, 0, 1   # Nothing changed: a 1-pixel frame carries the delay
+        self.canvas = image
+        pixels = image[top:bottom, left:right]
+        data = lzw_encode(pixels.tobytes(), 2)
+        self.file.write(b"\x21\xF9\x04\x04" + struct.pack("<H", delay) + b"\x00\x00")  # Keep the canvas
+        self.file.write(b"\x2C" + struct.pack("<HHHHB", left, top, right - left, bottom - top, 0))
+        self.file.write(b"\x02" + b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255]
+                                           for i in range(0, len(data), 255)) + b"\x00")
+
+    def close(self, frames):
+        try:
+            if self.pending is not None:
+                start, image = self.pending
+                self._write(image, max(_centiseconds(frames) - _centiseconds(start), MIN_GIF_DELAY))
+            self.file.write(b"\x3B")
+        finally:
+            self.file.close()
+
+
+def _centiseconds(frame):
+    return frame * 100 // TIMER_HZ
+
+
+def lzw_encode(pixels, min_size):
+    """GIF LZW code stream (variable-width codes, LSB first) of a bytes-like of indices"""
+    clear, end = 1 << min_size, (1 << min_size) + 1
+    out = bytearray()
+    acc = bits = 0
+
+    def emit(code, size):
+        nonlocal acc, bits
+        acc |= code << bits
+        bits += size
+        while bits >= 8:
+            out.append(acc & 0xFF)
+            acc >>= 8
+            bits -= 8
+
+    size = min_size + 1
+    codes = {}                        # (prefix code, pixel) -> code
+    next_code = end + 1
+    emit(clear, size)
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        code = codes.get((prefix, pixel))
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix, size)
+        if next_code < 4096:
+            codes[(prefix, pixel)] = next_code
+            if next_code == 1 << size:
+                size += 1
+            next_code += 1
+        else:
+            emit(clear, size)         # Table full: start over
+            codes.clear()
+            size, next_code = min_size + 1, end + 1
+        prefix = pixel
+    emit(prefix, size)
+    if next_code == 1 << size and size < 12:
+        size += 1                     # The decoder adds its entry for `prefix` before reading `end`
+    emit(end, size)
+    if bits:
+        out.append(acc & 0xFF)
+    return bytes(out)
+
+
+WRITERS = {".c8v": RawWriter, ".png": PngWriter, ".gif": GifWriter}
+
+
+def open_writer(filename, scale=DEFAULT_SCALE):
+    """Writer for a file name: .c8v (packed raw stream), .png (numbered sequence) or .gif"""
+    writer = WRITERS.get(Path(filename).suffix.lower())
+    if writer is None:
+        raise ValueError(f"Unknown video format {filename!r} (use {', '.join(WRITERS)})")
+    return writer(filename, scale)
+
+
+class FrameExporter:
+    """Captures the display once per frame and encodes it on a writer thread.
+
+    capture() is all the emulation thread does: an unchanged display costs
+    one bytes comparison, a changed one a copy put on a bounded queue. When
+    the writer falls QUEUE_FRAMES behind, changed frames are dropped (and
+    counted) instead of waiting, unless block=True (headless runs, where
+    nobody is watching the clock). The writer records frame numbers, so
+    unchanged and dropped frames still take their time in the video.
+    """
+
+    def __init__(self, filename, scale=DEFAULT_SCALE, block=False):
+        self.filename = filename
+        self.writer = open_writer(filename, scale)
+        self.block = block
+        self.frames = 0               # Frames captured
+        self.stored = 0               # Frames handed to the writer
+        self.dropped = 0
+        self.error = None             # Exception that stopped the writer
+        self.queue = queue.Queue(QUEUE_FRAMES)
+        self._last = None             # (width, height, display) of the last stored frame
+        self._thread = threading.Thread(target=self._write, name="frame-export", daemon=True)
+        self._thread.start()
+
+    def capture(self, chip8):
+        number = self.frames
+        self.frames += 1
+        last = self._last
+        if last is not None and chip8.display == last[2]:
+            return
+        frame = (chip8.width, chip8.height, bytes(chip8.display))
+        try:
+            self.queue.put((number, *frame), block=self.block)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._last = frame
+        self.stored += 1
+
+    def _write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.writer.frame(*item)
+                except Exception as e:    # Keep draining the queue so capture() never waits
+                    self.error = e
+
+    def close(self):
+        """Finish writing; raises what stopped the writer, if anything did.
+        The file is closed either way."""
+        self.queue.put(None)
+        self._thread.join()
+        try:
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.writer.close(self.frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a .c8v stream to a PNG sequence or a GIF")
+    parser.add_argument("stream", help=".c8v file written by --export")
+    parser.add_argument("output", help="output .png (numbered sequence) or .gif file")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE,
+                        help=f"image pixels per hi-res pixel (default {DEFAULT_SCALE})")
+    args = parser.parse_args()
+
+    writer = open_writer(args.output, args.scale)
+    frames = 0
+    last = None
+    for frame in read_raw(args.stream):
+        if frame != last:
+            writer.frame(frames, *frame)
+            last = frame
+        frames += 1
+    writer.close(frames)
+    print(f"🎞️  {frames} frames written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
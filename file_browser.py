@@ -1,23 +1,32 @@
 import os
 from pathlib import Path
+import shutil
 import sys
+import time
+
+from library import RomLibrary
 
 # Pour Windows, lecture des touches
 if os.name == "nt":
     import msvcrt
 else:
+    import select
     import termios
     import tty
 
-# Types de fichiers acceptés
-ROM_EXTENSIONS = ('.ch8', '.rom', '.bin', '.c8')
+HEADER_LINES = 5
 
 def clear():
     os.system('cls' if os.name == 'nt' else 'clear')
 
-def get_key():
-    """Lit une touche sans attendre Enter."""
+def get_key(timeout=None):
+    """Lit une touche sans attendre Enter (None si rien après `timeout` secondes)."""
     if os.name == "nt":
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not msvcrt.kbhit():
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.02)
         ch = msvcrt.getch()
         if ch == b'\xe0':  # Flèches spéciales
             ch2 = msvcrt.getch()
@@ -34,72 +43,145 @@ def get_key():
         old_settings = termios.tcgetattr(fd)
         try:
             tty.setraw(fd)
-            ch = sys.stdin.read(1)
-            if ch == '\x1b':
-                ch += sys.stdin.read(2)
+            if not select.select([fd], [], [], timeout)[0]:
+                return None
+            ch = os.read(fd, 1).decode(errors='ignore')
+            # Une flèche envoie 3 caractères d'un coup, Esc seul n'en envoie qu'un
+            if ch == '\x1b' and select.select([fd], [], [], 0.05)[0]:
+                ch += os.read(fd, 2).decode(errors='ignore')
             return ch
         finally:
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
-def list_directory(path: Path):
-    """Retourne la liste des dossiers et fichiers (ROMs uniquement)."""
+class Screen:
+    """Lignes affichées dans le terminal : draw() ne réécrit que celles qui ont changé."""
+
+    def __init__(self):
+        self.lines = []
+        clear()
+
+    def draw(self, lines):
+        out = []
+        for row, line in enumerate(lines):
+            if row >= len(self.lines) or self.lines[row] != line:
+                out.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+        if len(lines) < len(self.lines):
+            out.append(f"\x1b[{len(lines) + 1};1H\x1b[J")
+        sys.stdout.write("".join(out))
+        sys.stdout.flush()
+        self.lines = lines
+
+    def close(self):
+        sys.stdout.write(f"\x1b[{len(self.lines) + 1};1H\n")
+        sys.stdout.flush()
+
+def list_directory(path: Path, library: RomLibrary):
+    """Retourne la liste des dossiers et fichiers (ROMs uniquement), lue dans l'index."""
     items = []
     if path.parent != path:
         items.append(("..", True))
-    try:
-        for entry in sorted(path.iterdir(), key=lambda x: x.name.lower()):
-            if entry.is_dir():
-                items.append((entry.name, True))
-            elif entry.suffix.lower() in ROM_EXTENSIONS:
-                items.append((entry.name, False))
-    except PermissionError:
-        pass
+    subdirs, roms = library.list_directory(path)
+    items += [(name, True) for name in subdirs]
+    items += [(name, False) for name in roms]
     return items
 
-def select_rom_file():
-    """Navigateur de fichiers dans le terminal"""
-    current_path = Path.cwd()
-    selected_index = 0
+def search_items(library: RomLibrary, query):
+    """ROMs de l'index dont le nom contient `query`, avec leur chemin complet."""
+    return [(path, False) for path in library.search(query)]
 
-    while True:
-        items = list_directory(current_path)
-        clear()
+def format_item(name, is_dir, path, library, selected):
+    prefix = "[DIR]" if is_dir else "[ROM]"
+    line = f"{'>' if selected else ' '} {prefix} {name}"
+    entry = None if is_dir else library.get(path)
+    if entry is not None:
+        line = f"{line:<52} {entry['platform']:<8} {entry['size']:>6} B"
+    return line
 
-        print("📂 CHIP-8 ROM SELECTOR (Terminal Edition)")
-        print(f"Current path: {current_path}")
-        print("-" * 70)
-        print("↑/↓ = navigate | Enter = select | Backspace = parent | Esc = quit")
-        print("-" * 70)
+def select_rom_file(library=None):
+    """Navigateur de fichiers dans le terminal"""
+    library = library or RomLibrary()
+    current_path = Path.cwd().resolve()
+    indexed = current_path
+    library.start([current_path], depth=0)    # Indexation en arrière-plan, un dossier à la fois
+    selected_index = 0
+    query = None                       # Texte recherché ('/' pour chercher)
+    screen = Screen()
 
-        for i, (name, is_dir) in enumerate(items):
-            prefix = "[DIR]" if is_dir else "[ROM]"
-            if i == selected_index:
-                print(f"> {prefix} {name}")
+    try:
+        while True:
+            if current_path != indexed:
+                # On indexe le dossier affiché seulement quand on y entre
+                indexed = current_path
+                library.start([current_path], depth=0)
+            if query is None:
+                items = list_directory(current_path, library)
+                title = f"Current path: {current_path}"
             else:
-                print(f"  {prefix} {name}")
+                items = search_items(library, query)
+                title = f"Search: {query}_"
+            selected_index = min(selected_index, max(len(items) - 1, 0))
 
-        key = get_key()
+            # Seules les lignes visibles sont construites
+            height = max(shutil.get_terminal_size().lines - HEADER_LINES - 1, 1)
+            top = max(0, min(selected_index - height // 2, len(items) - height))
+            lines = [
+                "📂 CHIP-8 ROM SELECTOR (Terminal Edition)",
+                title,
+                "-" * 70,
+                "↑/↓ = navigate | Enter = select | / = search | Backspace = parent | Esc = quit",
+                "-" * 70,
+            ]
+            for i in range(top, min(top + height, len(items))):
+                name, is_dir = items[i]
+                path = Path(name) if query is not None else current_path / name
+                label = str(path) if query is not None else name
+                lines.append(format_item(label, is_dir, path, library, i == selected_index))
+            status = "Indexing..." if library.scanning else "Indexed"
+            lines.append(f"{status} {len(library.entries)} ROMs")
+            screen.draw(lines)
 
-        if key in ('\x1b[A', 'k'):  # flèche haut ou 'k'
-            selected_index = (selected_index - 1) % len(items)
-        elif key in ('\x1b[B', 'j'):  # flèche bas ou 'j'
-            selected_index = (selected_index + 1) % len(items)
-        elif key in ('\x08',):  # backspace sous Windows
-            if current_path.parent != current_path:
-                current_path = current_path.parent
-                selected_index = 0
-        elif key == '\r':  # entrée
-            name, is_dir = items[selected_index]
-            if is_dir:
-                if name == "..":
+            # Pendant l'indexation, on rafraîchit même sans touche
+            key = get_key(0.25 if library.scanning else None)
+            if key is None:
+                continue
+
+            if key in ('\x1b[A',) or (key == 'k' and query is None):  # flèche haut ou 'k'
+                selected_index = (selected_index - 1) % max(len(items), 1)
+            elif key in ('\x1b[B',) or (key == 'j' and query is None):  # flèche bas ou 'j'
+                selected_index = (selected_index + 1) % max(len(items), 1)
+            elif key in ('\x08', '\x7f'):  # backspace
+                if query is not None:
+                    query = query[:-1] if query else None
+                elif current_path.parent != current_path:
                     current_path = current_path.parent
+                    selected_index = 0
+            elif key == '\r':  # entrée
+                if not items:
+                    continue
+                name, is_dir = items[selected_index]
+                if query is not None:
+                    return name
+                if is_dir:
+                    if name == "..":
+                        current_path = current_path.parent
+                    else:
+                        current_path = current_path / name
+                    selected_index = 0
                 else:
-                    current_path = current_path / name
+                    return str(current_path / name)
+            elif key == '\x1b':  # échap
+                if query is None:
+                    return None
+                query = None
                 selected_index = 0
-            else:
-                return str(current_path / name)
-        elif key == '\x1b':  # échap
-            return None
+            elif key == '/' and query is None:
+                query = ""
+                selected_index = 0
+            elif query is not None and key.isprintable():
+                query += key
+                selected_index = 0
+    finally:
+        screen.close()
 
 # Test manuel
 if __name__ == "__main__":
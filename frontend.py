@@ -0,0 +1,209 @@
+import asyncio
+import math
+import time
+
+import numpy as np
+
+from scheduler import TIMER_HZ, next_deadline
+from savestate import save_state_file, load_state_file
+
+SLICES = 4                    # CPU time slices per frame: keys are seen within a quarter frame
+INPUT_HZ = 250                # Keyboard polling rate
+
+
+class FrameBuffers:
+    """Double-buffered framebuffer shared by the CPU task and the presenter.
+
+    The CPU task copies a finished frame into the back buffer and swaps;
+    the presenter only ever reads the front buffer, so it always shows a
+    whole frame and never holds up emulation. A buffer is reallocated
+    when the resolution changes (SCHIP 00FE/00FF).
+    """
+
+    def __init__(self, shape):
+        self.views = [np.zeros(shape, dtype=np.uint8) for _ in range(2)]
+        self.front = 0
+        self.serial = 0               # Number of frames published so far
+
+    def publish(self, gfx):
+        back = 1 - self.front
+        if self.views[back].shape != gfx.shape:
+            self.views[back] = np.empty_like(gfx)
+        self.views[back][...] = gfx
+        self.front = back
+        self.serial += 1
+
+    @property
+    def gfx(self):
+        return self.views[self.front]
+
+
+class RunningStats:
+    """Count, mean and standard deviation of a series in constant memory (Welford)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._squares = 0.0           # Sum of squared differences from the mean
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._squares += delta * (value - self.mean)
+
+    @property
+    def pstdev(self):
+        return math.sqrt(self._squares / self.count) if self.count else 0.0
+
+
+class Frontend:
+    """asyncio runtime of the windowed emulator.
+
+    Three tasks share the event loop:
+    - cpu: runs each frame in SLICES slices spread over the frame (timers
+      tick once per frame, so emulation is identical to run_frame), then
+      publishes the display to the FrameBuffers
+    - presenter: shows the newest published frame at 60 Hz
+    - input: polls the keyboard at INPUT_HZ
+    All pacing comes from loop.time() deadlines. While recording, frames
+    are not sliced, so key changes only land between frames like the
+    replay expects. An export.FrameExporter, if given, sees every frame
+    the CPU task publishes.
+    """
+
+    def __init__(self, chip8, window, scheduler, rewind, state_file, recorder=None, profiler=None,
+                 exporter=None):
+        self.chip8 = chip8
+        self.window = window
+        self.scheduler = scheduler
+        self.rewind = rewind
+        self.state_file = state_file
+        self.recorder = recorder
+        self.profiler = profiler
+        self.exporter = exporter
+        self.buffers = FrameBuffers(chip8.gfx.shape)
+        self.slices = 1 if recorder is not None else SLICES
+        self.running = True
+        self.ticks = RunningStats()   # Seconds between presenter ticks, for the jitter report
+        self.latencies = RunningStats()   # Seconds between a key poll and the CPU slice that sees it
+        self._last_tick = None
+        self._key_polled = None
+
+    async def run(self):
+        self.buffers.publish(self.chip8.gfx)
+        await asyncio.gather(self.cpu(), self.presenter(), self.input())
+
+    # --- CPU ---
+
+    async def cpu(self):
+        loop = asyncio.get_running_loop()
+        slice_time = 1 / TIMER_HZ / self.slices
+        deadline = loop.time()
+        while self.running:
+            self.handle_requests()
+            if self.window.rewinding and self.recorder is None:
+                self.rewind.rewind(self.chip8, 2)      # Rewind at twice the play speed
+                self.publish()
+                deadline = await self._sleep_until(loop, deadline, slice_time * self.slices)
+                continue
+
+            if self.recorder is not None:
+                self.recorder.frame(self.scheduler.frames, self.chip8.key)
+            cycles = self.scheduler.cycles_per_frame
+            for i in range(self.slices):
+                self._run(cycles * (i + 1) // self.slices - cycles * i // self.slices)
+                if i < self.slices - 1:
+                    deadline = await self._sleep_until(loop, deadline, slice_time)
+                    if not self.running:
+                        return
+            self.scheduler.end_frame()
+            self.rewind.push(self.chip8)
+            self.publish()
+            deadline = await self._sleep_until(loop, deadline, slice_time)
+
+    def _run(self, cycles):
+        if self._key_polled is not None:
+            self.latencies.add(time.perf_counter() - self._key_polled)
+            self._key_polled = None
+        try:
+            self.scheduler.run(cycles)
+        except Exception:
+            if self.chip8.trace is not None:
+                print(f"💥 Crash at PC={self.chip8.pc:03X}, last instructions:")
+                self.chip8.trace.dump(quirks=self.chip8.quirks)
+            raise
+
+    async def _sleep_until(self, loop, deadline, period):
+        """Wait for the deadline one period after `deadline` (see scheduler.next_deadline);
+        returns it to build the next one on"""
+        deadline, delay = next_deadline(deadline, period, loop.time())
+        await asyncio.sleep(delay)
+        return deadline
+
+    def publish(self):
+        if self.exporter is not None:
+            self.exporter.capture(self.chip8)
+        if self.chip8.draw_flag:
+            self.buffers.publish(self.chip8.gfx)
+            self.chip8.draw_flag = False
+
+    def handle_requests(self):
+        window = self.window
+        while window.requests:
+            request = window.requests.pop(0)
+            if request == "save":
+                save_state_file(self.chip8, self.state_file)
+                print(f"💾 State saved to {self.state_file}")
+            elif request == "load" and self.recorder is not None:
+                print("❌ Loading a state would break the recording")
+            elif request == "load":
+                try:
+                    load_state_file(self.chip8, self.state_file)
+                    self.rewind.clear()
+                    print(f"📂 State loaded from {self.state_file}")
+                except (OSError, ValueError) as e:
+                    print(f"❌ Error when loading state: {e}")
+
+    # --- Presenter ---
+
+    async def presenter(self):
+        loop = asyncio.get_running_loop()
+        frame_time = 1 / TIMER_HZ
+        deadline = loop.time()
+        shown = None
+        while self.running:
+            overlay = self.profiler is not None and self.window.show_overlay
+            if overlay:
+                self.window.overlay = self.profiler.overlay_lines()
+            if overlay or shown != self.buffers.serial:
+                shown = self.buffers.serial
+                self.window.present(self.buffers.gfx)
+            now = loop.time()
+            if self._last_tick is not None:
+                self.ticks.add(now - self._last_tick)
+            self._last_tick = now
+            deadline = await self._sleep_until(loop, deadline, frame_time)
+
+    # --- Input ---
+
+    async def input(self):
+        loop = asyncio.get_running_loop()
+        poll_time = 1 / INPUT_HZ
+        deadline = loop.time()
+        while self.running:
+            before = bytes(self.chip8.key)
+            self.running = self.window.handle_events(self.chip8)
+            if self._key_polled is None and self.chip8.key != before:
+                self._key_polled = time.perf_counter()
+            deadline = await self._sleep_until(loop, deadline, poll_time)
+
+    def report(self):
+        """One line about frame pacing and input latency, or None if too short to tell"""
+        ticks = self.ticks
+        if ticks.count < 2:
+            return None
+        line = f"Frame time {ticks.mean * 1000:.1f} ms ± {ticks.pstdev * 1000:.1f} ms"
+        if self.latencies.count:
+            line += f", key to CPU {self.latencies.mean * 1000:.1f} ms on average"
+        return line
@@ -0,0 +1,117 @@
+import hashlib
+import time
+
+from chip8 import Chip8
+from quirks import DEFAULT_QUIRKS
+from scheduler import FrameScheduler, DEFAULT_IPS
+from tracer import TRACE_OFF
+from profiler import Profiler
+
+DEFAULT_FRAMES = 600          # 10 seconds of emulated time
+
+
+def framebuffer_hash(chip8):
+    """SHA-1 of the display, one byte per pixel"""
+    return hashlib.sha1(bytes(chip8.display)).hexdigest()
+
+
+def machine_report(rom_file, chip8, cycles, frames, elapsed):
+    """Final machine state and timing of a headless run, as a dict"""
+    return {
+        "rom": str(rom_file),
+        "cycles": cycles,
+        "frames": frames,
+        "elapsed": elapsed,
+        "ips": cycles / elapsed if elapsed > 0 else 0.0,
+        "pc": chip8.pc,
+        "I": chip8.I,
+        "V": list(chip8.V),
+        "stack": list(chip8.stack[:chip8.sp]),
+        "delay_timer": chip8.delay_timer,
+        "sound_timer": chip8.sound_timer,
+        "unknown_opcodes": chip8.unknown_opcodes,
+        "framebuffer_hash": framebuffer_hash(chip8),
+    }
+
+
+def run_headless(rom_file, cycles=None, frames=None, ips=DEFAULT_IPS,
+                 trace=TRACE_OFF, trace_size=1024, jit=False, profile=False, seed=None,
+                 idle=True, quirks=DEFAULT_QUIRKS, export=None):
+    """Run a ROM with no window, no audio and no sleeping.
+
+    Runs `cycles` instructions if given, otherwise `frames` 60 Hz frames
+    (DEFAULT_FRAMES when neither is given). Timers still tick once every
+    ips/60 instructions so ROM behaviour matches a real-time run.
+    With jit=True straight-line code runs through jit.BlockCompiler.
+    With profile=True the result also has a "profile" entry (see profiler.py).
+    `seed` fixes the CXNN random numbers so two runs give the same result.
+    idle=False runs busy-wait loops instead of fast-forwarding them (see idle.py).
+    `quirks` names the profile of quirks.PROFILES the ROM runs with.
+    `export` is a video file (see export.py) the display is written to once per frame.
+    Returns a dict with the final machine state and a framebuffer hash.
+    """
+    chip8 = Chip8(sound=False, seed=seed, quirks=quirks)
+    chip8.set_trace(trace, trace_size)
+    chip8.load_program(rom_file)
+    profiler = None
+    if profile:
+        profiler = Profiler()
+        profiler.attach(chip8)
+    scheduler = FrameScheduler(chip8, ips, jit=jit, idle=idle)
+    exporter = None
+    if export is not None:
+        from export import FrameExporter  # NumPy
+        exporter = FrameExporter(export, block=True)
+        exporter.capture(chip8)
+
+    if cycles is None:
+        cycles = (frames or DEFAULT_FRAMES) * scheduler.cycles_per_frame
+    full_frames, remainder = divmod(cycles, scheduler.cycles_per_frame)
+
+    start = time.perf_counter()
+    crashed = True
+    try:
+        for _ in range(full_frames):
+            scheduler.run_frame()
+            if exporter is not None:
+                exporter.capture(chip8)
+        scheduler.run(remainder)
+        crashed = False
+    except Exception:
+        if chip8.trace is not None:
+            print(f"💥 Crash at PC={chip8.pc:03X}, last instructions:")
+            chip8.trace.dump(quirks=chip8.quirks)
+        raise
+    finally:
+        if exporter is not None:
+            try:
+                exporter.close()
+            except Exception:
+                if not crashed:
+                    raise                 # Otherwise the crash is the error to report
+    elapsed = time.perf_counter() - start
+
+    result = machine_report(rom_file, chip8, cycles, scheduler.frames, elapsed)
+    result["quirks"] = quirks
+    result["idle_cycles"] = scheduler.idle.skipped if scheduler.idle is not None else 0
+    if exporter is not None:
+        result["export"] = {"file": export, "frames": exporter.frames, "stored": exporter.stored}
+    if profiler is not None:
+        result["profile"] = profiler.to_dict()
+    return result
+
+
+def format_report(result):
+    regs = " ".join(f"{v:02X}" for v in result["V"])
+    return "\n".join([
+        f"ROM:     {result['rom']} ({result.get('quirks', DEFAULT_QUIRKS)} quirks)",
+        f"Cycles:  {result['cycles']} ({result['frames']} frames) "
+        f"in {result['elapsed']:.3f}s → {result['ips']:,.0f} instr/s",
+        f"PC={result['pc']:03X} I={result['I']:03X} "
+        f"DT={result['delay_timer']} ST={result['sound_timer']}",
+        f"V=[{regs}]",
+        f"Stack: {' '.join(f'{a:03X}' for a in result['stack']) or '-'}",
+        f"Unknown opcodes executed: {result['unknown_opcodes']}",
+        f"Idle:    {result.get('idle_cycles', 0) / max(result['cycles'], 1):.0%} of the cycles fast-forwarded",
+        f"Framebuffer SHA-1: {result['framebuffer_hash']}",
+    ])
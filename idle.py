@@ -0,0 +1,82 @@
+from quirks import has_opcode
+
+MAX_STEPS = 16                # Instructions watched for a repeat (loops up to this long are spotted)
+CHECK_INTERVAL = 64           # Instructions between two looks for an idle loop
+
+
+def is_pure(opcode):
+    """True if the instruction only reads memory, timers and keys, and writes V, I or PC.
+
+    Repeating such instructions from the same registers always gives the
+    same result while the timers and keys do not change, i.e. within one
+    FrameScheduler.run() call.
+    """
+    top, n, nn = opcode >> 12, opcode & 0xF, opcode & 0xFF
+    match top:
+        case 0x0:
+            return opcode == 0x00FD                       # SCHIP exit: PC never moves again
+        case 0x1 | 0x3 | 0x4 | 0x6 | 0x7 | 0x9 | 0xA:
+            return True
+        case 0x5:
+            return n != 0x2                               # 5XY2 stores to memory
+        case 0x8:
+            return n in (0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7, 0xE)
+        case 0xE:
+            return nn in (0x9E, 0xA1)
+        case 0xF:
+            return opcode == 0xF000 or nn in (0x07, 0x0A, 0x1E, 0x29, 0x30, 0x65, 0x85)
+    return False
+
+
+class IdleDetector:
+    """Spots busy-wait loops and skips the instructions they would burn.
+
+    A ROM waiting on the delay timer (FX07 / SE / JP back) or on a key
+    (FX0A, which leaves PC where it is) runs the same few pure
+    instructions over and over, and nothing they compute can change
+    until the next timer tick or key event, both of which only happen
+    between FrameScheduler.run() calls. fast_forward() steps up to
+    MAX_STEPS instructions; if the registers come back to a state seen
+    earlier and every instruction was pure, the loop is idle, and all
+    the whole loop iterations left in the budget are counted as run
+    without running them. The machine ends in exactly the state it
+    would have reached by running them.
+    """
+
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.skipped = 0                  # Instructions fast-forwarded so far
+        self._pure = {}                   # opcode -> is_pure(opcode)
+
+    def fast_forward(self, budget):
+        """Run up to MAX_STEPS instructions, skipping ahead if they turn out to loop idly.
+
+        Returns the number of instructions accounted for (run or skipped),
+        at most `budget`.
+        """
+        c = self.chip8
+        if c.trace is not None or c.profiler is not None:
+            return 0                      # They must see every instruction
+        memory, pure = c.memory, self._pure
+        seen = {(c.pc, bytes(c.V), c.I, c.sp): 0}   # Registers -> step they were seen at
+        steps = min(MAX_STEPS, budget)
+        for step in range(1, steps + 1):
+            opcode = (memory[c.pc] << 8) | memory[c.pc + 1]
+            flag = pure.get(opcode)
+            if flag is None:
+                # Opcodes outside the profile's instruction set count as unknown: not pure
+                flag = pure[opcode] = is_pure(opcode) and has_opcode(c.quirks, opcode)
+            c.emulation_cycle()
+            if not flag:
+                return step
+            state = (c.pc, bytes(c.V), c.I, c.sp)
+            first = seen.get(state)
+            if first is not None:
+                # Back to earlier registers: the loop from there repeats until the budget runs out
+                period = step - first
+                left = budget - step
+                skip = left - left % period   # Whole iterations only: the rest really runs
+                self.skipped += skip
+                return step + skip
+            seen[state] = step
+        return steps
@@ -0,0 +1,389 @@
+import re
+
+MAX_BLOCK = 32                # Straight-line instructions per block
+MIN_BLOCK = 4                 # Shorter blocks cost more to call than to interpret (loops excepted)
+HOT_ENTRIES = 16              # Times an address is entered before it is compiled
+CHAIN_DEPTH = 16              # Blocks a block may call directly before returning to run()
+PAGE = 16                     # Granularity of the invalidation index (bytes)
+NOT_COMPILABLE = False        # Marker: nothing to gain at this address
+_EXIT = "<exit>"              # Placeholder for a side exit in generated code
+
+_NAME = re.compile(r"\b[A-Za-z_]\w*\b")
+_TARGET = re.compile(r"^\s*(\w+) (?:[-+|&^]|>>|<<)?= ", re.MULTILINE)
+
+
+def _straight_line(opcode, quirks):
+    """Python statements for an instruction that always falls through to PC+2, as it
+    behaves under the `quirks` profile.
+
+    Returns (lines, ends_block) or None if the opcode may change control
+    flow (or draws / waits), in which case it terminates the block.
+    Registers live in locals v0..v15 and I in `i`, named by register
+    number so that aliasing (x == F, x == y) behaves like the V list.
+    """
+    x = (opcode & 0x0F00) >> 8
+    y = (opcode & 0x00F0) >> 4
+    n = opcode & 0x000F
+    nn = opcode & 0x00FF
+    nnn = opcode & 0x0FFF
+    vx, vy = f"v{x}", f"v{y}"
+    reset = ["v15 = 0"] if quirks.vf_reset else []
+    advance = [] if quirks.memory is None else [f"i += {x + quirks.memory}"]
+
+    match (opcode & 0xF000):
+        case (0x6000):  # LD Vx, byte
+            return [f"{vx} = {nn}"], False
+        case (0x7000):  # ADD Vx, byte
+            return [f"{vx} = ({vx} + {nn}) & 255"], False
+        case (0x8000):
+            match n:
+                case (0x0):
+                    return [f"{vx} = {vy}"], False
+                case (0x1):
+                    return [f"{vx} |= {vy}"] + reset, False
+                case (0x2):
+                    return [f"{vx} &= {vy}"] + reset, False
+                case (0x3):
+                    return [f"{vx} ^= {vy}"] + reset, False
+                case (0x4):
+                    return [f"t = {vx} + {vy}",
+                            "v15 = 1 if t > 255 else 0",
+                            f"{vx} = t & 255"], False
+                case (0x5):
+                    return [f"v15 = 1 if {vx} >= {vy} else 0",
+                            f"{vx} = ({vx} - {vy}) & 255"], False
+                case (0x6) if quirks.shifting:
+                    return [f"t = {vy} & 1",
+                            f"{vx} = {vy} >> 1",
+                            "v15 = t"], False
+                case (0x6):
+                    return [f"v15 = {vx} & 1",
+                            f"{vx} >>= 1"], False
+                case (0x7):
+                    return [f"v15 = 1 if {vy} >= {vx} else 0",
+                            f"{vx} = ({vy} - {vx}) & 255"], False
+                case (0xE) if quirks.shifting:
+                    return [f"t = ({vy} & 128) >> 7",
+                            f"{vx} = ({vy} << 1) & 255",
+                            "v15 = t"], False
+                case (0xE):
+                    return [f"v15 = ({vx} & 128) >> 7",
+                            f"{vx} = ({vx} << 1) & 255"], False
+        case (0xA000):  # LD I, addr
+            return [f"i = {nnn}"], False
+        case (0xC000):  # RND Vx, byte
+            return [f"{vx} = randint(0, 255) & {nn}"], False
+        case (0xF000):
+            match nn:
+                case (0x07):
+                    return [f"{vx} = c.delay_timer"], False
+                case (0x15):
+                    return [f"c.delay_timer = {vx}"], False
+                case (0x18):
+                    return [f"c.sound_timer = {vx}"], False
+                case (0x1E):
+                    return [f"i += {vx}"], False
+                case (0x29):
+                    return [f"i = 80 + {vx} * 5"], False
+                case (0x33):
+                    # Writes memory: last instruction of the block
+                    return [f"mem[i] = {vx} // 100",
+                            f"mem[i + 1] = ({vx} // 10) % 10",
+                            f"mem[i + 2] = {vx} % 10",
+                            "c.invalidate(i, 3)"], True
+                case (0x55):
+                    return [f"mem[i + {k}] = v{k}" for k in range(x + 1)] + \
+                           [f"c.invalidate(i, {x + 1})"] + advance, True
+                case (0x65):
+                    return [f"v{k} = mem[i + {k}]" for k in range(x + 1)] + advance, False
+    return None
+
+
+def _skip_condition(opcode):
+    """Python condition under which a skip opcode skips, or None"""
+    x = (opcode & 0x0F00) >> 8
+    y = (opcode & 0x00F0) >> 4
+    nn = opcode & 0x00FF
+
+    match (opcode & 0xF000):
+        case (0x3000):
+            return f"v{x} == {nn}"
+        case (0x4000):
+            return f"v{x} != {nn}"
+        case (0x5000):
+            if opcode & 0xF not in (0x2, 0x3):     # 5XY2/5XY3 are XO-CHIP loads/stores
+                return f"v{x} == v{y}"
+        case (0x9000):
+            return f"v{x} != v{y}"
+        case (0xE000):
+            if nn == 0x9E:
+                return f"c.key[v{x}]"
+            if nn == 0xA1:
+                return f"not c.key[v{x}]"
+    return None
+
+
+class BlockCompiler:
+    """Compiles hot runs of CHIP-8 code into Python functions.
+
+    A block starts at an address and follows the code through ALU/load
+    instructions and unconditional jumps. A skip over one plain
+    instruction becomes an `if`; other skips become side exits (the
+    taken branch leaves the block). The instruction that ends the block
+    (CALL, RET, DRW, FX0A...) runs through the normal cached handler.
+    Code that jumps back into its own block runs as a `while` loop, and
+    an exit to the start of another compiled block calls it directly.
+    Registers are held in locals and written back on exit. A block never
+    runs more than the `budget` it is given and returns how many
+    instructions it executed, so frame boundaries (and therefore timer
+    ticks) fall on exactly the same instruction as without the JIT.
+
+    Only jump targets entered HOT_ENTRIES times are compiled, and blocks
+    shorter than MIN_BLOCK are left to the interpreter: calling them
+    would cost more than it saves. Blocks are cached by start address
+    and dropped when Chip8.invalidate reports a write to memory they
+    cover.
+    """
+
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.reset()
+        chip8.jit = self
+
+    def reset(self):
+        self.blocks = [None] * len(self.chip8.memory)   # start -> block(budget) function or NOT_COMPILABLE
+        self.heat = bytearray(len(self.chip8.memory))   # Times each address was entered uncompiled
+        self.pages = {}                   # page -> set of block starts covering it
+
+    def invalidate(self, addr, length=1):
+        first = max(addr - 1, 0) // PAGE
+        last = (addr + length - 1) // PAGE
+        for page in range(first, last + 1):
+            starts = self.pages.pop(page, None)
+            if starts:
+                for start in starts:
+                    self.blocks[start] = None
+
+    def compile(self, start):
+        c = self.chip8
+        memory = c.memory
+        body = []
+        origin = []                       # Address of the instruction each body line belongs to
+        count = 0
+        pc = start
+        visited = []
+        terminator = None
+        stopped = False                   # Ended on an instruction that may rewrite code
+        marks = {}                        # pc -> (index in body, instructions before it)
+        skips = False                     # A skip over one instruction was inlined
+
+        while count < MAX_BLOCK and pc + 1 < len(memory) and pc not in visited:
+            visited.append(pc)
+            marks[pc] = (len(body), count)
+            opcode = (memory[pc] << 8) | memory[pc + 1]
+            if count:
+                # Stop when the caller's instruction budget runs out
+                body.append(f"if budget <= {count}:")
+                body.append(f"{_EXIT} {pc} {count}")
+                origin += [pc, pc]
+
+            decoded = _straight_line(opcode, c.quirks)
+            if decoded is not None:
+                lines, ends_block = decoded
+                body.extend(lines)
+                origin += [pc] * (len(body) - len(origin))
+                count += 1
+                pc += 2
+                if ends_block:
+                    stopped = True
+                    break
+                continue
+
+            condition = _skip_condition(opcode)
+            if condition is not None and memory[pc + 2:pc + 4] == b"\xF0\x00" and len(memory) > 0x1000:
+                condition = None          # XO-CHIP skips the whole F000 NNNN: leave it to the handler
+            following = _straight_line((memory[pc + 2] << 8) | memory[pc + 3], c.quirks) \
+                if condition is not None and pc + 3 < len(memory) and pc + 2 not in visited else None
+            if following is not None and not following[1]:
+                # Skip over a plain instruction: both paths continue at pc+4,
+                # a taken skip runs one instruction less
+                count += 1
+                visited.append(pc + 2)
+                body += [f"if {condition}:", "    done -= 1", "else:",
+                         f"    if budget <= done + {count}:", f"    {_EXIT} {pc + 2} {count}"]
+                origin += [pc] * (len(body) - len(origin))
+                body += ["    " + line for line in following[0]]
+                origin += [pc + 2] * (len(body) - len(origin))
+                count += 1
+                pc += 4
+                skips = True
+                continue
+            if condition is not None:
+                # Taken skip leaves the block, fall-through keeps compiling
+                count += 1
+                body.append(f"if {condition}:")
+                body.append(f"{_EXIT} {pc + 4} {count}")
+                origin += [pc] * (len(body) - len(origin))
+                pc += 2
+                continue
+
+            if opcode & 0xF000 == 0x1000:
+                # JP: keep compiling at the target
+                count += 1
+                pc = opcode & 0x0FFF
+                continue
+
+            terminator = c.decode(opcode)
+            break
+
+        # The code jumps back into the block: run it as a loop instead of
+        # returning to run() once per iteration
+        loop = marks.get(pc) if terminator is None and not stopped else None
+        if loop is None and count + (terminator is not None) < MIN_BLOCK:
+            self.blocks[start] = NOT_COMPILABLE
+            self.pages.setdefault(start // PAGE, set()).add(start)
+            return NOT_COMPILABLE
+        # Instructions run are counted in `done` where they vary: loop
+        # iterations, and skips that were taken
+        dynamic = loop is not None or skips
+        if dynamic:
+            body = [re.sub(r"^if budget <= (\d)", r"if budget <= done + \1", line) for line in body]
+        if loop is not None:
+            head, before = loop
+            body[head:] = ["while True:"] + ["    " + line for line in body[head:]]
+            origin.insert(head, pc)
+            body.append(f"    done += {count - before}")
+            if not before:
+                # Otherwise the budget check before the loop head's instruction does it
+                body.append("    if budget <= done:")
+                body.append(f"    {_EXIT} {pc} 0")
+            origin += [pc] * (len(body) - len(origin))
+
+        source = "\n".join(body)
+        names = _names(source)
+        used = [r for r in range(16) if f"v{r}" in names]
+
+        # Registers are loaded once and written back when the block returns.
+        # Side and budget exits share one out() function, which keeps the
+        # generated code (and its compile time) small
+        assigned = _assigned(source)
+        written = [f"v{r}" for r in range(16) if f"v{r}" in assigned]
+        if "i" in assigned:
+            written.append("i")
+        writeback = [f"V[{name[1:]}] = {name}" if name != "i" else "c.I = i" for name in written]
+
+        def chain(indent, target, executed):
+            # Run the block at `target` right away if there is one
+            return [f"{indent}if depth < {CHAIN_DEPTH} and {executed} < budget:",
+                    f"{indent}    nxt = blocks[{target}]",
+                    f"{indent}    if nxt:",
+                    f"{indent}        return {executed} + nxt(budget - {executed}, depth + 1)",
+                    f"{indent}return {executed}"]
+
+        lines = [f"def out(target, executed, budget, depth{''.join(', ' + name for name in written)}):"]
+        if written:
+            lines.append("    V = c.V")
+        lines += ["    " + wb for wb in writeback]
+        lines.append("    c.pc = target")
+        lines += chain("    ", "target", "executed")
+        lines.append("def block(budget, depth=0):")
+        lines.append("    V = c.V")
+        if dynamic:
+            lines.append("    done = 0")
+        if "mem" in names:
+            lines.append("    mem = c.memory")
+        if "i" in names:
+            lines.append("    i = c.I")
+        lines += [f"    v{r} = V[{r}]" for r in used]
+        # An instruction that raises (FX65 past the end of memory...) leaves
+        # the registers and PC as the interpreter would: written back, PC on
+        # the faulting instruction. Exceptions from chained blocks pass through
+        faults = {}                       # Line number in the generated code -> address
+        lines.append("    try:")
+        for line, addr in zip(body, origin):
+            stripped = line.lstrip()
+            if stripped.startswith(_EXIT):
+                _, target, executed = stripped.split()
+                indent = " " * (len(line) - len(stripped) + 12)
+                if dynamic:
+                    executed = f"done + {executed}"
+                args = "".join(", " + name for name in written)
+                lines.append(f"{indent}return out({target}, {executed}, budget, depth{args})")
+            else:
+                lines.append("        " + line)
+                faults[len(lines)] = addr
+        lines.append("    except BaseException as e:")
+        lines.append("        addr = faults.get(e.__traceback__.tb_lineno)")
+        lines.append("        if addr is not None:")
+        lines += ["            " + wb for wb in writeback]
+        lines.append("            c.pc = addr")
+        lines.append("        raise")
+        if loop is None:
+            lines += ["    " + wb for wb in writeback]
+            lines.append(f"    c.pc = {pc}")
+            if terminator is not None:
+                lines.append("    term()")
+                count += 1
+            lines.append(f"    executed = done + {count}" if dynamic else f"    executed = {count}")
+            lines += chain("    ", "c.pc", "executed")
+
+        namespace = {"c": c, "randint": c.rng.randint, "term": terminator, "blocks": self.blocks,
+                     "faults": faults}
+        exec(compile("\n".join(lines) + "\n", f"<block {start:03X}>", "exec"), namespace)
+
+        entry = namespace["block"]
+        self.blocks[start] = entry
+        for addr in visited:
+            for page in {addr // PAGE, (addr + 1) // PAGE}:
+                self.pages.setdefault(page, set()).add(start)
+        return entry
+
+    def run(self, cycles):
+        """Execute exactly `cycles` instructions"""
+        c = self.chip8
+        if c.trace is not None or c.profiler is not None:
+            # Blocks bypass tracer and profiler: single-step so every instruction is seen
+            for _ in range(cycles):
+                c.emulation_cycle()
+            return
+
+        blocks = self.blocks
+        heat = self.heat
+        cache = c._cache
+        step = c.emulation_cycle
+        fallthrough = c.pc                # Resuming mid-block is not a block entry
+        while cycles > 0:
+            pc = c.pc
+            entry = blocks[pc]
+            if entry:
+                cycles -= entry(cycles)
+                fallthrough = -1
+                continue
+            if entry is None and pc != fallthrough:
+                # A jump target (or the end of a block): compile it once it is hot
+                if heat[pc] < HOT_ENTRIES:
+                    heat[pc] += 1
+                elif self.compile(pc):
+                    continue
+            handler = cache[pc]
+            if handler is None:
+                step()
+            else:
+                handler()
+            cycles -= 1
+            if entry is NOT_COMPILABLE and handler is not None:
+                while c.pc == pc and cycles > 0:
+                    # Waiting in place (FX0A...): repeat it without the lookups
+                    handler()
+                    cycles -= 1
+            fallthrough = pc + 2
+
+def _names(source):
+    """Identifiers used in generated source"""
+    return set(_NAME.findall(source))
+
+
+def _assigned(source):
+    """Identifiers generated source assigns to"""
+    return set(_TARGET.findall(source))
+
@@ -0,0 +1,244 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+from quirks import instruction_set
+
+ROM_EXTENSIONS = ('.ch8', '.rom', '.bin', '.c8', '.sc8', '.xo8')
+INDEX_VERSION = 2
+DEFAULT_INDEX = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "chip8-emulator" / "library.json"
+
+# Platform -> quirk profile the ROM most likely expects
+QUIRKS = {"CHIP-8": "cosmac-vip", "SCHIP": "schip", "XO-CHIP": "xo-chip"}
+CHIP8_MAX_SIZE = 4096 - 0x200
+
+
+def detect_platform(name, data):
+    """Best guess of the platform a ROM was written for: CHIP-8, SCHIP or XO-CHIP.
+
+    Looks at the file extension, the size and the instructions reachable
+    from the entry point (see disasm.analyze; code only reached through
+    BNNN is not seen, so the result is a hint).
+    """
+    from disasm import analyze, decode_all    # NumPy: only loaded when a ROM is (re)hashed
+
+    suffix = Path(name).suffix.lower()
+    if suffix == ".xo8" or len(data) > CHIP8_MAX_SIZE:
+        return "XO-CHIP"
+    schip = suffix == ".sc8"
+    opcodes = decode_all(data).tolist()
+    for addr in sorted(analyze(data).code):
+        match instruction_set(opcodes[addr - 0x200]):
+            case "xo-chip":
+                return "XO-CHIP"
+            case "schip":
+                schip = True
+    return "SCHIP" if schip else "CHIP-8"
+
+
+def suggest_quirks(path):
+    """Quirk profile a ROM file most likely expects (see QUIRKS)"""
+    path = Path(path)
+    return QUIRKS[detect_platform(path.name, path.read_bytes())]
+
+
+def describe(path, stat):
+    """Index entry of a ROM file (reads and hashes it)"""
+    data = path.read_bytes()
+    platform = detect_platform(path.name, data)
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha1": hashlib.sha1(data).hexdigest(),
+        "platform": platform,
+        "quirks": QUIRKS[platform],
+    }
+
+
+class RomLibrary:
+    """Index of the ROMs under some directories, cached on disk.
+
+    entries maps an absolute path to its metadata (see describe()).
+    scan() walks the directories once, down to a given depth and
+    without following symbolic links to directories, reusing the
+    cached entry of every file whose size and mtime did not change. It
+    remembers the listing of each directory it visited so a browser can
+    read from memory instead of the file system. start() runs scans in
+    a background thread, one after the other; readers may look at the
+    library while it runs.
+    """
+
+    def __init__(self, index_file=DEFAULT_INDEX):
+        self.index_file = Path(index_file)
+        self.entries = {}
+        self.listings = {}                # directory -> (subdirectory names, ROM names), sorted
+        self.scanning = False
+        self.version = 0                  # Bumped whenever entries or listings change
+        self._lock = threading.Lock()
+        self._thread = None
+        self._queue = deque()             # (roots, depth) waiting for the scan thread
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.entries = data["entries"]
+
+    def save(self):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_suffix(".tmp")
+        with self._lock:
+            data = {"version": INDEX_VERSION, "entries": self.entries}
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.index_file)   # Never leave a half-written index
+
+    def start(self, roots, depth=None):
+        """Scan `roots` in a background thread (and save the index when done).
+
+        If a scan is already running, this one is queued behind it.
+        """
+        with self._lock:
+            self._queue.append((roots, depth))
+            if self.scanning:
+                return
+            self.scanning = True
+        self._thread = threading.Thread(target=self._scan_and_save, daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _scan_and_save(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        self.scanning = False
+                        self.version += 1
+                        return
+                    roots, depth = self._queue.popleft()
+                try:
+                    self.scan(roots, depth)
+                    self.save()
+                except OSError:
+                    pass                  # A missing cache is only slower next time
+        except BaseException:
+            self.scanning = False
+            raise
+
+    def scan(self, roots, depth=None):
+        """Update the index for the ROMs under `roots`; returns the number of files (re)hashed.
+
+        `depth` is how many levels of subdirectories are scanned (0: the
+        roots only, None: no limit). Symbolic links to directories are
+        listed but not entered, and a directory reached twice is scanned once.
+        """
+        hashed = 0
+        seen = set()
+        scanned = set()
+        pending = [(Path(root).resolve(), 0) for root in roots]
+        while pending:
+            directory, level = pending.pop()
+            if directory in scanned:
+                continue
+            scanned.add(directory)
+            subdirs, roms = self.list_directory(directory, refresh=True)
+            if depth is None or level < depth:
+                pending.extend((directory / name, level + 1) for name in subdirs
+                               if not (directory / name).is_symlink())
+            for name in roms:
+                path = directory / name
+                key = str(path)
+                seen.add(key)
+                try:
+                    stat = path.stat()
+                    entry = self.entries.get(key)
+                    if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+                        entry = describe(path, stat)
+                        hashed += 1
+                except OSError:
+                    continue
+                with self._lock:
+                    self.entries[key] = entry
+                    self.version += 1
+
+        # Forget ROMs that were deleted from the scanned directories
+        scanned = {str(directory) for directory in scanned}
+        with self._lock:
+            for key in [k for k in self.entries if k not in seen and os.path.dirname(k) in scanned]:
+                del self.entries[key]
+        return hashed
+
+    def list_directory(self, directory, refresh=False):
+        """(subdirectory names, ROM names) of a directory, read from disk once"""
+        directory = Path(directory)
+        listing = self.listings.get(directory)
+        if listing is None or refresh:
+            subdirs, roms = [], []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif Path(entry.name).suffix.lower() in ROM_EXTENSIONS:
+                            roms.append(entry.name)
+            except OSError:
+                pass
+            listing = (sorted(subdirs, key=str.lower), sorted(roms, key=str.lower))
+            with self._lock:
+                self.listings[directory] = listing
+                self.version += 1
+        return listing
+
+    def get(self, path):
+        """Entry of an absolute, resolved path (None if not indexed yet)"""
+        return self.entries.get(str(path))
+
+    def search(self, text, limit=None):
+        """Paths of indexed ROMs whose name contains `text` (case-insensitive), sorted.
+
+        A ROM found under several paths (copies, links) is listed once.
+        """
+        text = text.lower()
+        with self._lock:
+            matches = sorted((k for k in self.entries if text in Path(k).name.lower()),
+                             key=lambda k: (Path(k).name.lower(), k))
+            hashes = [self.entries[k]["sha1"] for k in matches]
+        found, known = [], set()
+        for path, sha1 in zip(matches, hashes):
+            if sha1 not in known:
+                known.add(sha1)
+                found.append(path)
+        return found[:limit] if limit else found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the ROMs under some directories")
+    parser.add_argument("roots", nargs="*", default=["."], help="directories to scan (default .)")
+    parser.add_argument("--depth", type=int, help="levels of subdirectories to scan (default: all)")
+    parser.add_argument("--search", help="only list ROMs whose name contains this text")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f"index file (default {DEFAULT_INDEX})")
+    args = parser.parse_args()
+
+    library = RomLibrary(args.index)
+    hashed = library.scan(args.roots, args.depth)
+    library.save()
+    paths = library.search(args.search or "")
+    for path in paths:
+        entry = library.entries[path]
+        print(f"{entry['sha1'][:12]}  {entry['platform']:<8} {entry['quirks']:<11} {entry['size']:>6}  {path}")
+    print(f"📚 {len(paths)} ROMs listed, {hashed} new or changed, index in {args.index}")
+
+
+if __name__ == "__main__":
+    main()
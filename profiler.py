@@ -0,0 +1,169 @@
+import json
+import time
+
+FRAME_BUCKET_US = 250         # Width of a frame-time histogram bucket
+FRAME_BUCKETS = 80            # 0-20 ms, the last bucket also counts anything slower
+
+
+def opcode_family(opcode):
+    """Short name of the instruction family, e.g. 0x8AB4 -> "8XY4" """
+    top = opcode >> 12
+    match top:
+        case 0x0:
+            if opcode & 0xFFE0 == 0x00C0:
+                return f"00{opcode >> 4 & 0xF:X}N"        # Scroll down/up
+            if opcode in (0x00E0, 0x00EE, 0x00FB, 0x00FC, 0x00FD, 0x00FE, 0x00FF):
+                return f"{opcode:04X}"
+            return "0NNN"
+        case 0x1 | 0x2 | 0xA | 0xB:
+            return f"{top:X}NNN"
+        case 0x3 | 0x4 | 0x6 | 0x7 | 0xC:
+            return f"{top:X}XNN"
+        case 0x5:
+            return f"5XY{opcode & 0xF:X}" if opcode & 0xF in (2, 3) else "5XY0"
+        case 0x9:
+            return "9XY0"
+        case 0x8:
+            return f"8XY{opcode & 0xF:X}"
+        case 0xD:
+            return "DXY0" if opcode & 0xF == 0 else "DXYN"
+        case 0xF if opcode & 0xFF in (0x00, 0x02):
+            return f"F{opcode & 0xFFF:03X}"               # Long I, audio pattern
+        case _:
+            return f"{top:X}X{opcode & 0xFF:02X}"
+
+
+class Profiler:
+    """Runtime instrumentation for one Chip8.
+
+    attach() swaps the machine to a profiled subclass, whose emulation_cycle
+    counts and times every instruction; detach() swaps it back, so a
+    machine that is not being profiled runs the plain dispatch with no
+    extra check.
+
+    Collected data:
+    - per opcode family: executions and total time
+    - heat map: executions per address (64K entries, enough for XO-CHIP)
+    - histogram of instruction times (power-of-two nanosecond buckets)
+    - frame times (between two timer ticks) and instructions per frame
+    """
+
+    def __init__(self):
+        self.families = []                 # family index -> name
+        self._family_of = {}               # opcode -> family index
+        self.counts = []
+        self.times = []                    # ns per family
+        self.heat = [0] * 0x10000
+        self.instr_histogram = [0] * 32    # bucket = ns.bit_length()
+        self.frame_histogram = [0] * FRAME_BUCKETS
+        self.frame_cycles = []             # instructions per frame, last frames only
+        self.frames = 0
+        self._frame_start = None
+        self._cycles_in_frame = 0
+        self.chip8 = None
+        self._base = None
+
+    def attach(self, chip8):
+        if chip8.trace is not None:
+            raise ValueError("Profiling and tracing cannot be combined")
+        self._base = type(chip8)
+        chip8.profiler = self
+        chip8.__class__ = _profiled_class(self._base)
+        self.chip8 = chip8
+
+    def detach(self):
+        if self.chip8 is not None:
+            self.chip8.__class__ = self._base
+            self.chip8.profiler = None
+            self.chip8 = None
+
+    def family_index(self, opcode):
+        index = self._family_of.get(opcode)
+        if index is None:
+            name = opcode_family(opcode)
+            if name not in self.families:
+                self.families.append(name)
+                self.counts.append(0)
+                self.times.append(0)
+            index = self._family_of[opcode] = self.families.index(name)
+        return index
+
+    def frame(self):
+        """Called on every timer tick (once per 60 Hz frame)"""
+        now = time.perf_counter_ns()
+        if self._frame_start is not None:
+            bucket = (now - self._frame_start) // (FRAME_BUCKET_US * 1000)
+            self.frame_histogram[min(bucket, FRAME_BUCKETS - 1)] += 1
+            self.frame_cycles.append(self._cycles_in_frame)
+            if len(self.frame_cycles) > 3600:
+                del self.frame_cycles[:1800]
+        self._frame_start = now
+        self._cycles_in_frame = 0
+        self.frames += 1
+
+    def top(self, n=5):
+        """(family, count, total ns) sorted by total time, most expensive first"""
+        rows = sorted(zip(self.families, self.counts, self.times), key=lambda r: -r[2])
+        return rows[:n]
+
+    def to_dict(self):
+        return {
+            "families": {
+                name: {"count": count, "total_ns": ns, "mean_ns": ns / count if count else 0}
+                for name, count, ns in self.top(len(self.families))
+            },
+            "heat_map": {f"{addr:03X}": n for addr, n in enumerate(self.heat) if n},
+            "instruction_ns_histogram": {
+                f"<{1 << b}": n for b, n in enumerate(self.instr_histogram) if n
+            },
+            "frame_us_histogram": {
+                f"{b * FRAME_BUCKET_US}-{(b + 1) * FRAME_BUCKET_US}": n
+                for b, n in enumerate(self.frame_histogram) if n
+            },
+            "frames": self.frames,
+            "instructions_per_frame": self.frame_cycles[-600:],
+        }
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def overlay_lines(self, n=5):
+        """Short text summary for Chip8Window's overlay"""
+        total = sum(self.times) or 1
+        return [f"{name:<5}{count:>9} {ns / total:>4.0%}" for name, count, ns in self.top(n)]
+
+
+class ProfiledMixin:
+    """Counts and times each instruction into self.profiler"""
+
+    __slots__ = ()
+
+    def emulation_cycle(self):
+        profiler = self.profiler
+        pc = self.pc
+        family = profiler.family_index((self.memory[pc] << 8) | self.memory[pc + 1])
+        start = time.perf_counter_ns()
+        super().emulation_cycle()
+        elapsed = time.perf_counter_ns() - start
+        profiler.counts[family] += 1
+        profiler.times[family] += elapsed
+        profiler.heat[pc] += 1
+        profiler.instr_histogram[min(elapsed.bit_length(), 31)] += 1
+        profiler._cycles_in_frame += 1
+
+    def update_timers(self):
+        self.profiler.frame()
+        super().update_timers()
+
+
+_profiled_classes = {}
+
+
+def _profiled_class(base):
+    """Profiled subclass of a Chip8 class (same layout, so __class__ can be swapped)"""
+    cls = _profiled_classes.get(base)
+    if cls is None:
+        cls = type(f"Profiled{base.__name__}", (ProfiledMixin, base), {"__slots__": ()})
+        _profiled_classes[base] = cls
+    return cls
@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+# How the opcodes that differ between interpreters behave:
+# - vf_reset: 8XY1/8XY2/8XY3 set VF to 0
+# - memory: FX55/FX65 leave I alone (None) or add X (0) or X+1 (1) to it
+# - shifting: 8XY6/8XYE shift VY into VX instead of shifting VX in place
+# - jumping: BNNN jumps to NNN+V0 ("v0"), BXNN to XNN+VX ("vx"), or is unknown (None)
+# - sprites: past the edges, DXYN continues on the next display row ("flat"),
+#   is cut off ("clip") or comes back on the opposite edge ("wrap")
+# - display_wait: at most one DXYN per frame, the next one waits for the timer tick
+# - memory_size: bytes of RAM the platform has
+# - opcodes: the instruction set decoded, "chip-8", "schip" or "xo-chip" (each
+#   a superset of the one before); the others run as unknown opcodes
+Quirks = namedtuple("Quirks", "name vf_reset memory shifting jumping sprites display_wait memory_size opcodes")
+
+PROFILES = {
+    # What this emulator always did; the default, so old input logs and hashes stay valid
+    "legacy": Quirks("legacy", False, None, False, None, "flat", False, 0x1000, "xo-chip"),
+    "cosmac-vip": Quirks("cosmac-vip", True, 1, True, "v0", "clip", True, 0x1000, "chip-8"),
+    "chip-48": Quirks("chip-48", False, 0, False, "vx", "clip", False, 0x1000, "chip-8"),
+    "schip": Quirks("schip", False, None, False, "vx", "clip", False, 0x1000, "schip"),
+    "xo-chip": Quirks("xo-chip", False, 1, True, "v0", "wrap", False, 0x10000, "xo-chip"),
+}
+DEFAULT_QUIRKS = "legacy"
+INSTRUCTION_SETS = ("chip-8", "schip", "xo-chip")
+
+
+def get_quirks(name):
+    """Profile by name (ValueError if there is none)"""
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown quirk profile {name!r} (known: {', '.join(PROFILES)})") from None
+
+
+def instruction_set(opcode):
+    """Smallest instruction set (see INSTRUCTION_SETS) that has `opcode`"""
+    top, n, nn = opcode >> 12, opcode & 0xF, opcode & 0xFF
+    match top:
+        case 0x0 if opcode & 0xFFF0 == 0x00D0:
+            return "xo-chip"                      # scroll up
+        case 0x0 if opcode & 0xFFF0 == 0x00C0 or opcode in (0x00FB, 0x00FC, 0x00FD, 0x00FE, 0x00FF):
+            return "schip"                        # scrolling, exit, lo/hi-res
+        case 0x5 if n in (0x2, 0x3):
+            return "xo-chip"                      # save/load range
+        case 0xD if n == 0:
+            return "schip"                        # 16x16 sprite
+        case 0xF if opcode in (0xF000, 0xF002) or nn in (0x01, 0x3A):
+            return "xo-chip"                      # long I, audio pattern, planes, pitch
+        case 0xF if nn in (0x30, 0x75, 0x85):
+            return "schip"                        # big font, RPL flags
+    return "chip-8"
+
+
+def has_opcode(quirks, opcode):
+    """True if the profile's instruction set includes `opcode`"""
+    return INSTRUCTION_SETS.index(instruction_set(opcode)) <= INSTRUCTION_SETS.index(quirks.opcodes)
@@ -0,0 +1,124 @@
+import hashlib
+import struct
+import time
+
+from chip8 import Chip8
+from quirks import get_quirks, DEFAULT_QUIRKS
+from scheduler import FrameScheduler
+from headless import machine_report
+
+# Layout: header, then one EVENT per change of the keypad state
+MAGIC = b"C8IN"
+VERSION = 2
+HEADER = struct.Struct(">4sBQI20sI20s16s")   # magic, version, seed, ips, ROM SHA-1, frames, framebuffer SHA-1, quirks
+HEADER_V1 = struct.Struct(">4sBQI20sI20s")   # Logs from before quirk profiles: always legacy
+EVENT = struct.Struct(">IH")              # frame number, keypad bitmask (bit k = key k held)
+
+
+def key_mask(key):
+    """Keypad state as a 16-bit mask"""
+    mask = 0
+    for k, pressed in enumerate(key):
+        if pressed:
+            mask |= 1 << k
+    return mask
+
+
+def set_keys(key, mask):
+    for k in range(16):
+        key[k] = (mask >> k) & 1
+
+
+def rom_hash(rom_file):
+    with open(rom_file, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class InputLog:
+    """Seed, CPU speed, quirk profile and keypad changes of a run, enough to replay it exactly"""
+
+    def __init__(self, seed, ips, rom_sha1, events=None, frames=0, framebuffer_sha1=bytes(20),
+                 quirks=DEFAULT_QUIRKS):
+        self.seed = seed
+        self.ips = ips
+        self.quirks = quirks
+        self.rom_sha1 = rom_sha1
+        self.events = events if events is not None else []   # (frame, mask), frames increasing
+        self.frames = frames                                  # Length of the run
+        self.framebuffer_sha1 = framebuffer_sha1              # Display at the end of the run
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.ips, self.rom_sha1,
+                                self.frames, self.framebuffer_sha1, self.quirks.encode()))
+            f.write(b"".join(EVENT.pack(frame, mask) for frame, mask in self.events))
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            data = f.read()
+        header = HEADER_V1 if data[4:5] == b"\x01" else HEADER
+        if len(data) < header.size or (len(data) - header.size) % EVENT.size:
+            raise ValueError(f"Bad input log size: {len(data)} bytes")
+        magic, version, seed, ips, rom_sha1, frames, fb_sha1, *quirks = header.unpack_from(data)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("Not a Chip-8 input log (or unsupported version)")
+        quirks = quirks[0].rstrip(b"\0").decode() if quirks else DEFAULT_QUIRKS
+        get_quirks(quirks)                # ValueError if this version does not know the profile
+        events = list(EVENT.iter_unpack(data[header.size:]))
+        return cls(seed, ips, rom_sha1, events, frames, fb_sha1, quirks)
+
+
+class InputRecorder:
+    """Builds an InputLog from a live run: call frame() before every emulated frame"""
+
+    def __init__(self, rom_file, seed, ips, quirks=DEFAULT_QUIRKS):
+        self.log = InputLog(seed, ips, rom_hash(rom_file), quirks=quirks)
+        self._mask = 0
+
+    def frame(self, number, key):
+        mask = key_mask(key)
+        if mask != self._mask:
+            self.log.events.append((number, mask))
+            self._mask = mask
+
+    def finish(self, chip8, frames, filename):
+        """Store the run length and final display, then write the log"""
+        self.log.frames = frames
+        self.log.framebuffer_sha1 = hashlib.sha1(bytes(chip8.display)).digest()
+        self.log.save(filename)
+        return self.log
+
+
+def run_replay(rom_file, log_file, jit=False, idle=True):
+    """Play an input log back headless, as fast as possible.
+
+    Runs the same number of frames at the recorded speed, seed and quirks,
+    setting the keypad at the frame each change was recorded. The result
+    is machine_report()'s dict plus "matches": whether the final display
+    is identical to the recorded one. idle=False runs busy-wait loops
+    instead of fast-forwarding them (see idle.py).
+    """
+    log = InputLog.load(log_file)
+    if rom_hash(rom_file) != log.rom_sha1:
+        raise ValueError(f"{rom_file} is not the ROM this log was recorded with")
+
+    chip8 = Chip8(sound=False, seed=log.seed, quirks=log.quirks)
+    chip8.load_program(rom_file)
+    scheduler = FrameScheduler(chip8, log.ips, jit=jit, idle=idle)
+
+    events = log.events
+    next_event = 0
+    start = time.perf_counter()
+    for frame in range(log.frames):
+        while next_event < len(events) and events[next_event][0] == frame:
+            set_keys(chip8.key, events[next_event][1])
+            next_event += 1
+        scheduler.run_frame()
+    elapsed = time.perf_counter() - start
+
+    result = machine_report(rom_file, chip8, log.frames * scheduler.cycles_per_frame,
+                            scheduler.frames, elapsed)
+    result["quirks"] = log.quirks
+    result["matches"] = result["framebuffer_hash"] == log.framebuffer_sha1.hex()
+    return result
@@ -0,0 +1,117 @@
+import struct
+from array import array
+import zlib
+from collections import deque
+
+from chip8 import LORES, HIRES
+
+# Layout: header (registers, timers, stack, display mode, memory size), then
+# memory, V, display, keys and RPL flags as raw bytes
+MAGIC = b"C8ST"
+VERSION = 2
+# magic, version, I, pc, sp, DT, ST, stack, display width, height, planes, memory size
+HEADER = struct.Struct(">4sBIHBBB16HBBBI")
+V_SIZE, KEY_SIZE, FLAGS_SIZE = 16, 16, 16
+
+
+def state_size(data):
+    """Length of the snapshot starting at data[0], from its header"""
+    *_, width, height, _, memory_size = HEADER.unpack_from(data)
+    return HEADER.size + memory_size + V_SIZE + width * height + KEY_SIZE + FLAGS_SIZE
+
+
+def save_state(chip8):
+    """Snapshot the whole machine into a bytes object"""
+    header = HEADER.pack(MAGIC, VERSION, chip8.I, chip8.pc, chip8.sp,
+                         chip8.delay_timer, chip8.sound_timer, *chip8.stack,
+                         chip8.width, chip8.height, chip8.planes, len(chip8.memory))
+    return b"".join((header, chip8.memory, chip8.V, chip8.display, chip8.key, chip8.flags))
+
+
+def load_state(chip8, data):
+    """Restore a snapshot made by save_state"""
+    if len(data) < HEADER.size:
+        raise ValueError(f"Bad save state size: {len(data)} bytes")
+    magic, version, I, pc, sp, dt, st, *stack, width, height, planes, memory_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a Chip-8 save state (or unsupported version)")
+    if len(data) != state_size(data) or (width, height) not in (LORES, HIRES):
+        raise ValueError(f"Bad save state size: {len(data)} bytes (expected {state_size(data)})")
+
+    view = memoryview(data)
+    offset = HEADER.size + memory_size
+    memory = view[HEADER.size:offset]
+    if chip8.memory != memory:
+        chip8.set_memory_size(memory_size)
+        chip8.memory[:] = memory
+        chip8.invalidate(0, memory_size)   # Cached decodes/blocks may be stale
+    if (chip8.width, chip8.height) != (width, height):
+        chip8.set_resolution((width, height))
+    for buffer in (chip8.V, chip8.display, chip8.key, chip8.flags):
+        buffer[:] = view[offset:offset + len(buffer)]
+        offset += len(buffer)
+
+    chip8.set_planes(planes)
+    chip8.I, chip8.pc, chip8.sp = I, pc, sp
+    chip8.delay_timer, chip8.sound_timer = dt, st
+    chip8.stack[:] = array("H", stack)
+    chip8.draw_flag = True
+
+
+def save_state_file(chip8, filename):
+    with open(filename, "wb") as f:
+        f.write(save_state(chip8))
+
+
+def load_state_file(chip8, filename):
+    with open(filename, "rb") as f:
+        load_state(chip8, f.read())
+
+
+def _xor(a, b):
+    """XOR of two snapshots; the shorter one (other display mode) is padded with zeros"""
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(max(len(a), len(b)), "little")
+
+
+class RewindBuffer:
+    """Per-frame history of the machine, bounded in size.
+
+    Only the newest snapshot is kept in full. Each older frame is stored
+    as the zlib-compressed XOR between it and the frame after it, so
+    unchanged memory and pixels cost almost nothing. Rewinding walks the
+    chain backwards from the newest snapshot; when the ring is full the
+    oldest delta is simply dropped.
+    """
+
+    def __init__(self, seconds=180, fps=60):
+        self.deltas = deque(maxlen=seconds * fps)
+        self.current = None                # Newest full snapshot
+
+    def __len__(self):
+        return len(self.deltas)
+
+    @property
+    def nbytes(self):
+        return sum(len(d) for d in self.deltas) + (len(self.current) if self.current else 0)
+
+    def clear(self):
+        self.deltas.clear()
+        self.current = None
+
+    def push(self, chip8):
+        """Record the current frame"""
+        state = save_state(chip8)
+        if self.current is not None:
+            self.deltas.append(zlib.compress(_xor(state, self.current), 1))
+        self.current = state
+
+    def rewind(self, chip8, frames=1):
+        """Step the machine back by up to `frames` frames; returns how many"""
+        done = 0
+        while done < frames and self.deltas:
+            state = _xor(self.current, zlib.decompress(self.deltas.pop()))
+            self.current = state[:state_size(state)]
+            done += 1
+        if done:
+            load_state(chip8, self.current)
+        return done
@@ -0,0 +1,96 @@
+import time
+
+from chip8 import Chip8
+from idle import IdleDetector, CHECK_INTERVAL
+
+TIMER_HZ = 60                 # DT/ST tick rate, also the display frame rate
+DEFAULT_IPS = 700             # Instructions per second
+MAX_LAG = 0.25                # Seconds behind schedule before we stop catching up
+
+
+def next_deadline(deadline, period, now):
+    """Advance a deadline on a fixed grid, so sleep jitter does not accumulate.
+
+    Returns (new deadline, seconds to sleep until it, 0 when late). More
+    than MAX_LAG behind (debugger, window drag...), the grid restarts at
+    `now` instead of running a burst of periods to catch up.
+    """
+    deadline += period
+    delay = deadline - now
+    if delay < -MAX_LAG:
+        deadline = now
+    return deadline, max(delay, 0)
+
+
+class FrameScheduler:
+    """Runs the CPU in batches of instructions, one batch per 60 Hz frame.
+
+    Timers are ticked exactly once per frame, independently of the CPU
+    speed. wait() sleeps until the next frame deadline; deadlines are kept
+    on an absolute time.perf_counter() grid so sleep jitter does not
+    accumulate into drift. Busy-wait loops are fast-forwarded (see
+    idle.py) unless idle=False; the machine state is the same either way.
+    """
+
+    def __init__(self, chip8, ips=DEFAULT_IPS, jit=False, idle=True):
+        self.chip8 = chip8
+        self.jit = None
+        if jit:
+            from jit import BlockCompiler
+            self.jit = BlockCompiler(chip8)
+        self.idle = None
+        if idle and isinstance(chip8, Chip8):   # Not for VectorChip8
+            self.idle = IdleDetector(chip8)
+        self.frame_time = 1 / TIMER_HZ
+        self.set_speed(ips)
+        self.frames = 0
+        self.next_frame = time.perf_counter()
+
+    def set_speed(self, ips):
+        self.ips = ips
+        self.cycles_per_frame = max(1, round(ips / TIMER_HZ))
+
+    def run(self, cycles):
+        """Execute `cycles` instructions without ticking the timers.
+
+        Every CHECK_INTERVAL instructions, the IdleDetector gets a chance to
+        fast-forward through a busy-wait loop.
+        """
+        if self.idle is None:
+            self._execute(cycles)
+            return
+        while cycles > 0:
+            cycles -= self.idle.fast_forward(cycles)
+            chunk = min(cycles, CHECK_INTERVAL)
+            self._execute(chunk)
+            cycles -= chunk
+
+    def _execute(self, cycles):
+        if self.jit is not None:
+            self.jit.run(cycles)
+        else:
+            cycle = self.chip8.emulation_cycle
+            for _ in range(cycles):
+                cycle()
+
+    def end_frame(self):
+        """Tick the timers: called once per frame, after its instructions"""
+        self.chip8.update_timers()
+        self.frames += 1
+
+    def run_frame(self):
+        """Execute one frame worth of instructions, then tick the timers"""
+        self.run(self.cycles_per_frame)
+        self.end_frame()
+
+    def wait(self):
+        """Sleep until the next frame is due"""
+        delay = self.frame_delay()
+        if delay > 0:
+            time.sleep(delay)
+
+    def frame_delay(self):
+        """Move to the next frame deadline and return the seconds left until it
+        (0 when late), for callers that sleep their own way (asyncio)"""
+        self.next_frame, delay = next_deadline(self.next_frame, self.frame_time, time.perf_counter())
+        return delay
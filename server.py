@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import struct
+from pathlib import Path
+
+from chip8 import Chip8
+from quirks import PROFILES
+from scheduler import FrameScheduler, DEFAULT_IPS
+
+# Every message is a MESSAGE header followed by `length` bytes of payload:
+# - HELLO (client, first message): path of the ROM under the served directory, UTF-8
+# - KEY (client, any time after HELLO): KEY_EVENT
+# - FRAME (server): FRAME_HEADER, then for each changed row its ROW index and `width` pixel bytes
+# - ERROR (server): UTF-8 text; the server closes the connection after it
+MESSAGE = struct.Struct(">BH")            # type, payload length
+HELLO, KEY, FRAME, ERROR = 1, 2, 3, 4
+KEY_EVENT = struct.Struct(">BB")          # key 0-F, 1 pressed / 0 released
+FRAME_HEADER = struct.Struct(">IHHH")     # frame number, width, height, changed rows
+ROW = struct.Struct(">H")                 # row index
+DEFAULT_PORT = 8064
+MAX_BUFFERED = 64 * 1024      # Bytes queued for a slow client before its frames are held back
+
+
+def encode(kind, payload=b""):
+    return MESSAGE.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    """(type, payload) of the next message; asyncio.IncompleteReadError at end of stream"""
+    kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+    return kind, await reader.readexactly(length)
+
+
+def frame_message(number, width, height, display, previous):
+    """FRAME with the rows of `display` that differ from `previous`, or None if none do.
+
+    Every row is sent when there is no previous frame or its size differs
+    (SCHIP resolution change).
+    """
+    full = previous is None or len(previous) != len(display)
+    rows = []
+    for start in range(0, width * height, width):
+        row = display[start:start + width]
+        if full or row != previous[start:start + width]:
+            rows.append(ROW.pack(start // width) + row)
+    if not rows:
+        return None
+    return encode(FRAME, FRAME_HEADER.pack(number, width, height, len(rows)) + b"".join(rows))
+
+
+def apply_frame(payload, display):
+    """Apply a FRAME payload to a client-side display; returns (number, width, height, display)"""
+    number, width, height, count = FRAME_HEADER.unpack_from(payload)
+    if len(display) != width * height:
+        display = bytearray(width * height)
+    offset = FRAME_HEADER.size
+    for _ in range(count):
+        (y,) = ROW.unpack_from(payload, offset)
+        offset += ROW.size
+        display[y * width:(y + 1) * width] = payload[offset:offset + width]
+        offset += width
+    return number, width, height, display
+
+
+class Session:
+    """One client's machine: runs it at 60 Hz and sends the rows that changed"""
+
+    def __init__(self, chip8, scheduler, writer):
+        self.chip8 = chip8
+        self.scheduler = scheduler
+        self.writer = writer
+        self.sent = None              # Display as the client has it
+        self.held = 0                 # Frames not sent because the client was behind
+
+    async def run(self, reader):
+        keys = asyncio.ensure_future(self.read_keys(reader))
+        try:
+            await self.stream(keys)
+        finally:
+            keys.cancel()
+
+    async def stream(self, keys):
+        scheduler = self.scheduler
+        self.send()
+        while not keys.done():
+            scheduler.run_frame()
+            self.send()
+            await asyncio.sleep(scheduler.frame_delay())
+        keys.result()                     # Raises what stopped the client side, if anything
+
+    def send(self):
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            self.held += 1                # The next frame carries these changes too
+            return
+        c = self.chip8
+        message = frame_message(self.scheduler.frames, c.width, c.height, c.display, self.sent)
+        if message is not None:
+            self.writer.write(message)
+            self.sent = bytes(c.display)
+
+    async def read_keys(self, reader):
+        """Apply KEY messages until the client disconnects"""
+        key = self.chip8.key
+        while True:
+            try:
+                kind, payload = await read_message(reader)
+            except asyncio.IncompleteReadError:
+                return
+            if kind != KEY or len(payload) != KEY_EVENT.size:
+                raise ValueError(f"Unexpected message type {kind} ({len(payload)} bytes)")
+            number, pressed = KEY_EVENT.unpack(payload)
+            if number > 0xF:
+                raise ValueError(f"No key {number}")
+            key[number] = 1 if pressed else 0
+
+
+class FrameServer:
+    """Serves emulator sessions over TCP or a Unix socket.
+
+    Each connection gets its own Chip8 running the ROM its HELLO names
+    (a path under `root`), paced at 60 Hz on the server's event loop, so
+    one process serves many machines. After every frame the rows of the
+    display that changed since the last FRAME are sent; a client that
+    reads too slowly gets fewer, larger updates instead of a growing
+    backlog.
+    """
+
+    def __init__(self, root, ips=DEFAULT_IPS, quirks="auto", max_sessions=64):
+        self.root = Path(root).resolve()
+        self.ips = ips
+        self.quirks = quirks
+        self.max_sessions = max_sessions
+        self.sessions = set()
+        self.server = None
+        self._next_id = 0
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """Listen on host:port, or on the Unix socket `path` if given"""
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def rom_path(self, name):
+        path = (self.root / name).resolve()
+        if self.root not in path.parents or not path.is_file():
+            raise ValueError(f"No ROM {name!r}")
+        return path
+
+    def open_machine(self, name):
+        path = self.rom_path(name)
+        quirks = self.quirks
+        if quirks == "auto":
+            from library import suggest_quirks
+            quirks = suggest_quirks(path)
+        chip8 = Chip8(sound=False, quirks=quirks)
+        chip8.load_program(str(path))
+        return chip8
+
+    async def handle(self, reader, writer):
+        self._next_id += 1
+        number = self._next_id
+        try:
+            kind, payload = await read_message(reader)
+            if kind != HELLO:
+                raise ValueError("The first message must be HELLO")
+            if len(self.sessions) >= self.max_sessions:
+                raise ValueError("Server full")
+            name = payload.decode()
+            chip8 = self.open_machine(name)
+            session = Session(chip8, FrameScheduler(chip8, self.ips), writer)
+        except (ValueError, OSError, asyncio.IncompleteReadError) as e:
+            writer.write(encode(ERROR, str(e).encode()))
+            await self._close(writer)
+            return
+
+        print(f"🔌 Session {number}: {name} ({chip8.quirks.name} quirks)")
+        self.sessions.add(session)
+        try:
+            await session.run(reader)
+        except (ConnectionError, ValueError) as e:
+            writer.write(encode(ERROR, str(e).encode()))
+        except Exception as e:            # A crashing ROM only ends its own session
+            print(f"💥 Session {number} crashed at PC={session.chip8.pc:03X}: {e!r}")
+            writer.write(encode(ERROR, f"Emulation stopped: {e!r}".encode()))
+        finally:
+            self.sessions.discard(session)
+            await self._close(writer)
+            print(f"👋 Session {number} closed after {session.scheduler.frames} frames")
+
+    async def _close(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class FrameClient:
+    """Thin client: keeps a copy of a session's display and sends keys"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.frame = None             # Number of the last frame received
+        self.width = self.height = 0
+        self.display = bytearray()
+
+    @classmethod
+    async def connect(cls, rom, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode(HELLO, rom.encode()))
+        return cls(reader, writer)
+
+    async def next_frame(self):
+        """Wait for the next FRAME and apply it; ConnectionError on ERROR"""
+        kind, payload = await read_message(self.reader)
+        if kind == ERROR:
+            raise ConnectionError(payload.decode())
+        self.frame, self.width, self.height, self.display = apply_frame(payload, self.display)
+        return self.frame
+
+    def key(self, key, pressed):
+        self.writer.write(encode(KEY, KEY_EVENT.pack(key, pressed)))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(args):
+    server = FrameServer(args.roms, ips=args.ips, quirks=args.quirks, max_sessions=args.max_sessions)
+    listener = await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"📡 Serving ROMs from {server.root} on {where}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve emulator sessions over a socket")
+    parser.add_argument("roms", help="directory clients can pick ROMs from")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default {DEFAULT_PORT})")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--ips", type=int, default=DEFAULT_IPS,
+                        help=f"CPU speed of every session (default {DEFAULT_IPS})")
+    parser.add_argument("--quirks", choices=["auto", *PROFILES], default="auto",
+                        help="quirk profile of every session (default: guessed per ROM)")
+    parser.add_argument("--max-sessions", type=int, default=64, help="sessions served at once")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("👋 Server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import struct
+import sys
+
+# Trace levels
+TRACE_OFF = 0      # No tracing, the CPU runs the plain emulation_cycle
+TRACE_RING = 1     # Keep the last N instructions in a preallocated buffer
+TRACE_PRINT = 2    # Ring buffer + print every instruction (slow, debugging only)
+
+TRACE_LEVELS = {"off": TRACE_OFF, "ring": TRACE_RING, "print": TRACE_PRINT}
+
+# One record: PC, opcode, V0-VF
+RECORD = struct.Struct(">HH16B")
+
+
+class TraceBuffer:
+    """Fixed-size ring buffer of executed (pc, opcode, registers) records"""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.buffer = bytearray(RECORD.size * size)
+        self.count = 0                    # Total records written
+
+    def record(self, pc, opcode, V):
+        RECORD.pack_into(self.buffer, (self.count % self.size) * RECORD.size,
+                         pc, opcode, *V)
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def entries(self):
+        """Yield (pc, opcode, V) tuples, oldest first"""
+        first = self.count - len(self)
+        for i in range(first, self.count):
+            record = RECORD.unpack_from(self.buffer, (i % self.size) * RECORD.size)
+            yield record[0], record[1], record[2:]
+
+    def dump(self, file=None, quirks=None):
+        """Write the buffered instructions as text (stderr by default), decoded
+        as the `quirks` profile does"""
+        from disasm import decode_opcode    # NumPy tables, only needed when dumping
+        file = file or sys.stderr
+        for pc, opcode, V in self.entries():
+            regs = " ".join(f"{v:02X}" for v in V)
+            file.write(f"{pc:03X}: {opcode:04X}  {decode_opcode(opcode, quirks):<16} V=[{regs}]\n")
@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import random
+import time
+from array import array
+from functools import partial
+
+import numpy as np
+
+from chip8 import Chip8, fontset, bigfont, FONT_ADDR, BIGFONT_ADDR, DISPLAY_SIZE
+from scheduler import FrameScheduler, DEFAULT_IPS
+
+# Bits of every byte value, MSB first: SPRITE_BITS[0x81] == [1,0,0,0,0,0,0,1]
+SPRITE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1)
+_ROW_OFFSETS = (np.arange(16) * 64)[:, np.newaxis] + np.arange(8)   # (row, col) -> display offset
+
+
+class VectorChip8:
+    """N Chip-8 machines stepped in lock-step, state held in NumPy arrays.
+
+    memory is (N, 4096), V (N, 16), display (N, 2048) (see gfx for the
+    (N, 32, 64) view), and pc, I, sp and the timers are (N,). Every
+    emulation_cycle() fetches the opcode of each machine, groups the
+    machines by opcode and runs each group as one vectorized operation,
+    so N copies of a ROM cost about as much as one while they stay on
+    the same code path. Given the same seed and keys, machine i ends in
+    exactly the state a Chip8 would (see to_chip8()).
+
+    The class has the emulation_cycle/update_timers interface of Chip8,
+    so FrameScheduler can drive it (without the JIT). Only plain CHIP-8
+    with the legacy quirks is covered: SCHIP/XO-CHIP opcodes count as
+    unknown (DXY0 draws nothing), and there is no hi-res mode.
+    """
+
+    def __init__(self, n, seeds=None):
+        self.n = n
+        self.memory = np.zeros((n, 4096), dtype=np.uint8)
+        self.V = np.zeros((n, 16), dtype=np.uint8)
+        self.I = np.zeros(n, dtype=np.int64)
+        self.pc = np.full(n, 0x200, dtype=np.int64)
+        self.display = np.zeros((n, DISPLAY_SIZE), dtype=np.uint8)
+        self.stack = np.zeros((n, 16), dtype=np.int64)
+        self.sp = np.zeros(n, dtype=np.int64)
+        self.delay_timer = np.zeros(n, dtype=np.int64)
+        self.sound_timer = np.zeros(n, dtype=np.int64)
+        self.key = np.zeros((n, 16), dtype=np.uint8)     # Set per machine by the caller
+        self.draw_flag = np.zeros(n, dtype=bool)
+        self.unknown_opcodes = np.zeros(n, dtype=np.int64)
+        seeds = seeds if seeds is not None else [None] * n
+        self.rngs = [random.Random(seed) for seed in seeds]   # CXNN, one stream per machine
+        self._all = np.arange(n)
+        self._base = self._all * 4096                         # Offset of each machine in memory.ravel()
+        self._cache = {}                                      # opcode -> handler(machines)
+        self.memory[:, FONT_ADDR:FONT_ADDR + len(fontset)] = fontset
+        self.memory[:, BIGFONT_ADDR:BIGFONT_ADDR + len(bigfont)] = bigfont
+
+    @property
+    def gfx(self):
+        """(N, 32, 64) view of the displays"""
+        return self.display.reshape(self.n, 32, 64)
+
+    def load_program(self, filename):
+        """Load the same ROM into every machine"""
+        with open(filename, "rb") as f:
+            program = f.read()
+        if len(program) > 4096 - 0x200:
+            raise ValueError(f"ROM too large ({len(program)} bytes, max {4096 - 0x200})")
+        self.memory[:, 0x200:0x200 + len(program)] = np.frombuffer(program, dtype=np.uint8)
+
+    def update_timers(self):
+        """Decrement every machine's timers (60 Hz)"""
+        np.subtract(self.delay_timer, 1, out=self.delay_timer, where=self.delay_timer > 0)
+        np.subtract(self.sound_timer, 1, out=self.sound_timer, where=self.sound_timer > 0)
+
+    def emulation_cycle(self):
+        """Run one instruction on every machine"""
+        memory = self.memory.ravel()
+        pc = self.pc
+        ops = memory.take(self._base + (pc & 0xFFF)).astype(np.int64) << 8
+        ops |= memory.take(self._base + ((pc + 1) & 0xFFF))
+        first = int(ops[0])
+        if (ops == first).all():
+            self._handler(first)(self._all)
+            return
+        # Machines have diverged: one vectorized call per distinct opcode
+        order = ops.argsort(kind="stable")
+        ops = ops[order]
+        bounds = (np.flatnonzero(ops[1:] != ops[:-1]) + 1).tolist()
+        for start, end in zip([0] + bounds, bounds + [self.n]):
+            self._handler(int(ops[start]))(order[start:end])
+
+    def _handler(self, opcode):
+        handler = self._cache.get(opcode)
+        if handler is None:
+            handler = self._cache[opcode] = self.decode(opcode)
+        return handler
+
+    def decode(self, opcode):
+        """Handler for `opcode`, called with the indices of the machines running it"""
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        nn = opcode & 0x00FF
+        nnn = opcode & 0x0FFF
+
+        match (opcode & 0xF000):
+            case (0x0000):
+                match nn:
+                    case (0x00E0):
+                        return self._op_cls
+                    case (0x00EE):
+                        return self._op_ret
+            case (0x1000):
+                return partial(self._op_jp, nnn)
+            case (0x2000):
+                return partial(self._op_call, nnn)
+            case (0x3000):
+                return partial(self._op_skip_if, lambda m: self.V[m, x] == nn)
+            case (0x4000):
+                return partial(self._op_skip_if, lambda m: self.V[m, x] != nn)
+            case (0x5000):
+                if n not in (0x2, 0x3):
+                    return partial(self._op_skip_if, lambda m: self.V[m, x] == self.V[m, y])
+            case (0x6000):
+                return partial(self._op_ld_byte, x, nn)
+            case (0x7000):
+                return partial(self._op_add_byte, x, nn)
+            case (0x8000):
+                if n in (0x0, 0x1, 0x2, 0x3, 0x4, 0x5, 0x6, 0x7, 0xE):
+                    return partial(self._op_alu, x, y, n)
+            case (0x9000):
+                return partial(self._op_skip_if, lambda m: self.V[m, x] != self.V[m, y])
+            case (0xA000):
+                return partial(self._op_ld_i, nnn)
+            case (0xC000):
+                return partial(self._op_rnd, x, nn)
+            case (0xD000):
+                return partial(self._op_drw, x, y, n)
+            case (0xE000):
+                match nn:
+                    case (0x009E):
+                        return partial(self._op_skip_if, lambda m: self.key[m, self.V[m, x] & 0xF] != 0)
+                    case (0x00A1):
+                        return partial(self._op_skip_if, lambda m: self.key[m, self.V[m, x] & 0xF] == 0)
+            case (0xF000):
+                match nn:
+                    case (0x07):
+                        return partial(self._op_ld_vx_dt, x)
+                    case (0x0A):
+                        return partial(self._op_ld_vx_k, x)
+                    case (0x15):
+                        return partial(self._op_ld_dt_vx, x)
+                    case (0x18):
+                        return partial(self._op_ld_st_vx, x)
+                    case (0x1E):
+                        return partial(self._op_add_i_vx, x)
+                    case (0x29):
+                        return partial(self._op_ld_f_vx, x)
+                    case (0x33):
+                        return partial(self._op_ld_b_vx, x)
+                    case (0x55):
+                        return partial(self._op_ld_i_vx, x)
+                    case (0x65):
+                        return partial(self._op_ld_vx_i, x)
+
+        return self._op_unknown
+
+    # --- Opcode handlers, `m` = indices of the machines running the opcode ---
+
+    def _op_unknown(self, m):
+        self.unknown_opcodes[m] += 1
+        self.pc[m] += 2
+
+    def _op_cls(self, m):  # 00E0
+        self.display[m] = 0
+        self.draw_flag[m] = True
+        self.pc[m] += 2
+
+    def _op_ret(self, m):  # 00EE
+        empty = self.sp[m] == 0
+        self.pc[m[empty]] += 2                 # Underflow: ignored, like Chip8
+        m = m[~empty]
+        self.sp[m] -= 1
+        self.pc[m] = self.stack[m, self.sp[m]]
+
+    def _op_jp(self, nnn, m):  # 1NNN
+        self.pc[m] = nnn
+
+    def _op_call(self, nnn, m):  # 2NNN
+        full = self.sp[m] == 16
+        self.pc[m[full]] += 2                  # Overflow: ignored, like Chip8
+        m = m[~full]
+        self.stack[m, self.sp[m]] = self.pc[m] + 2
+        self.sp[m] += 1
+        self.pc[m] = nnn
+
+    def _op_skip_if(self, condition, m):  # 3XNN 4XNN 5XY0 9XY0 EX9E EXA1
+        self.pc[m] += np.where(condition(m), 4, 2)
+
+    def _op_ld_byte(self, x, nn, m):  # 6XNN
+        self.V[m, x] = nn
+        self.pc[m] += 2
+
+    def _op_add_byte(self, x, nn, m):  # 7XNN
+        self.V[m, x] = (self.V[m, x].astype(np.int64) + nn) & 0xFF
+        self.pc[m] += 2
+
+    def _op_alu(self, x, y, n, m):  # 8XYN
+        V = self.V
+        vx = V[m, x].astype(np.int64)
+        vy = V[m, y].astype(np.int64)
+        # Same order as Chip8: VF is written first, then Vx from the registers
+        # read again (so VF as an operand sees the new flag)
+        match n:
+            case (0x0):
+                result = vy
+            case (0x1):
+                result = vx | vy
+            case (0x2):
+                result = vx & vy
+            case (0x3):
+                result = vx ^ vy
+            case (0x4):
+                result = vx + vy
+                V[m, 0xF] = result > 0xFF
+            case (0x5):
+                V[m, 0xF] = vx >= vy
+                result = V[m, x].astype(np.int64) - V[m, y]
+            case (0x6):
+                V[m, 0xF] = vx & 0x1
+                result = V[m, x] >> 1
+            case (0x7):
+                V[m, 0xF] = vy >= vx
+                result = V[m, y].astype(np.int64) - V[m, x]
+            case (0xE):
+                V[m, 0xF] = (vx & 0x80) >> 7
+                result = V[m, x].astype(np.int64) << 1
+        V[m, x] = result & 0xFF
+        self.pc[m] += 2
+
+    def _op_ld_i(self, nnn, m):  # ANNN
+        self.I[m] = nnn
+        self.pc[m] += 2
+
+    def _op_rnd(self, x, nn, m):  # CXNN, each machine draws from its own stream
+        rngs = self.rngs
+        self.V[m, x] = [rngs[i].randint(0, 255) & nn for i in m.tolist()]
+        self.pc[m] += 2
+
+    def _op_drw(self, vx, vy, height, m):  # DXYN
+        if height == 0:
+            self.V[m, 0xF] = 0
+        else:
+            addresses = self.I[m, np.newaxis] + np.arange(height)
+            rows = self.memory.ravel().take(self._base[m, np.newaxis] + (addresses & 0xFFF))
+            rows[addresses > 0xFFF] = 0        # Chip8 reads no rows past the end of memory
+            sprite = SPRITE_BITS[rows]                                     # (k, height, 8)
+            offset = self.V[m, vx] % 64 + self.V[m, vy].astype(np.int64) % 32 * 64
+            pixels = (offset[:, np.newaxis, np.newaxis] + _ROW_OFFSETS[:height]) % DISPLAY_SIZE
+            pixels += (m * DISPLAY_SIZE)[:, np.newaxis, np.newaxis]      # Index into display.ravel()
+            display = self.display.ravel()
+            old = display.take(pixels)
+            self.V[m, 0xF] = (old & sprite).any(axis=(1, 2))
+            display.put(pixels, old ^ sprite)
+        self.draw_flag[m] = True
+        self.pc[m] += 2
+
+    def _op_ld_vx_dt(self, x, m):  # FX07
+        self.V[m, x] = self.delay_timer[m]
+        self.pc[m] += 2
+
+    def _op_ld_vx_k(self, x, m):  # FX0A: machines with no key held stay on this opcode
+        keys = self.key[m] != 0
+        pressed = keys.any(axis=1)
+        m, first = m[pressed], keys[pressed].argmax(axis=1)
+        self.V[m, x] = first
+        self.pc[m] += 2
+
+    def _op_ld_dt_vx(self, x, m):  # FX15
+        self.delay_timer[m] = self.V[m, x]
+        self.pc[m] += 2
+
+    def _op_ld_st_vx(self, x, m):  # FX18
+        self.sound_timer[m] = self.V[m, x]
+        self.pc[m] += 2
+
+    def _op_add_i_vx(self, x, m):  # FX1E
+        self.I[m] += self.V[m, x]
+        self.pc[m] += 2
+
+    def _op_ld_f_vx(self, x, m):  # FX29
+        self.I[m] = FONT_ADDR + self.V[m, x].astype(np.int64) * 5
+        self.pc[m] += 2
+
+    def _op_ld_b_vx(self, x, m):  # FX33 (BCD)
+        value = self.V[m, x]
+        addresses = (self.I[m, np.newaxis] + np.arange(3)) & 0xFFF
+        self.memory[m[:, np.newaxis], addresses] = np.stack((value // 100, value // 10 % 10, value % 10), axis=1)
+        self.pc[m] += 2
+
+    def _op_ld_i_vx(self, x, m):  # FX55
+        addresses = (self.I[m, np.newaxis] + np.arange(x + 1)) & 0xFFF
+        self.memory[m[:, np.newaxis], addresses] = self.V[m, :x + 1]
+        self.pc[m] += 2
+
+    def _op_ld_vx_i(self, x, m):  # FX65
+        addresses = (self.I[m, np.newaxis] + np.arange(x + 1)) & 0xFFF
+        self.V[m, :x + 1] = self.memory[m[:, np.newaxis], addresses]
+        self.pc[m] += 2
+
+    # --- Per-machine access ---
+
+    def framebuffer_hash(self, i):
+        """Same SHA-1 as headless.framebuffer_hash for a Chip8 in machine i's state"""
+        return hashlib.sha1(self.display[i].tobytes()).hexdigest()
+
+    def to_chip8(self, i):
+        """Copy of machine i as a standalone Chip8 (no sound), e.g. to save or inspect it"""
+        chip8 = Chip8(sound=False)
+        chip8.memory[:] = self.memory[i].tobytes()
+        chip8.invalidate(0, 4096)
+        chip8.V[:] = self.V[i].tobytes()
+        chip8.display[:] = self.display[i].tobytes()
+        chip8.key[:] = self.key[i].tobytes()
+        chip8.I, chip8.pc, chip8.sp = int(self.I[i]), int(self.pc[i]), int(self.sp[i])
+        chip8.stack[:] = array("H", self.stack[i].tolist())
+        chip8.delay_timer, chip8.sound_timer = int(self.delay_timer[i]), int(self.sound_timer[i])
+        chip8.unknown_opcodes = int(self.unknown_opcodes[i])
+        chip8.rng.setstate(self.rngs[i].getstate())
+        return chip8
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many copies of a ROM in lock-step")
+    parser.add_argument("rom", help="ROM file")
+    parser.add_argument("-n", "--machines", type=int, default=256, help="number of copies")
+    parser.add_argument("--frames", type=int, default=600, help="60 Hz frames to run")
+    parser.add_argument("--ips", type=int, default=DEFAULT_IPS, help="instructions per second")
+    parser.add_argument("--seed", type=int, default=0, help="machine i uses seed + i for CXNN")
+    parser.add_argument("--random-keys", action="store_true",
+                        help="every frame, each machine holds a random key (or none)")
+    args = parser.parse_args()
+
+    machines = VectorChip8(args.machines, seeds=range(args.seed, args.seed + args.machines))
+    machines.load_program(args.rom)
+    scheduler = FrameScheduler(machines, args.ips)
+    keys = np.random.default_rng(args.seed)
+
+    print(f"🚀 Running {args.machines} copies of {args.rom} for {args.frames} frames...")
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        if args.random_keys:
+            held = keys.integers(0, 17, args.machines)      # 16 = no key
+            machines.key[:] = 0
+            machines.key[held < 16, held[held < 16]] = 1
+        scheduler.run_frame()
+    elapsed = time.perf_counter() - start
+
+    total = args.frames * scheduler.cycles_per_frame * args.machines
+    screens = {machines.framebuffer_hash(i) for i in range(args.machines)}
+    print(f"✅ {total:,} instructions in {elapsed:.2f}s → {total / elapsed:,.0f} instr/s in total")
+    print(f"   {len(screens)} distinct final screens, "
+          f"{int(machines.unknown_opcodes.sum())} unknown opcodes executed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import pygame
+import numpy as np
+
+from chip8 import PALETTE
 
 SCALE = 10
-WIDTH, HEIGHT = 64, 32
+WIDTH, HEIGHT = 64, 32            # Low resolution; the window stays this size in SCHIP hi-res
 
 key_map = {
     pygame.K_1: 0x1,
@@ -23,19 +26,79 @@ key_map = {
 }
 
 class Chip8Window:
-    def __init__(self):
+    def __init__(self, max_fps=60):
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH*SCALE, HEIGHT*SCALE))
         pygame.display.set_caption("Chip8 Emulator")
 
+        # 1 pixel = 1 CHIP-8 pixel, same pixel format as the screen so the
+        # scaled blit is a straight copy (remade when the resolution changes)
+        self.frame = pygame.Surface((WIDTH, HEIGHT), 0, self.screen)
+        self.colors = np.array([self.frame.map_rgb(c) for c in PALETTE], dtype=np.uint32)
+
+        self.min_interval = 1000 / max_fps if max_fps else 0   # ms between presents
+        self.last_present = None
+        self.shown = None                 # Framebuffer currently on screen
+        self.requests = []                # "save" / "load" asked from the keyboard
+        self.rewinding = False            # Backspace held
+        self.show_overlay = False         # F1 toggles the profiler overlay
+        self.overlay = None               # Text lines drawn over the game
+        self.font = None
+
+    def dirty_rects(self, gfx):
+        """Screen rectangles covering the rows that changed since the last present"""
+        changed = np.flatnonzero((gfx != self.shown).any(axis=1))
+        scale = HEIGHT * SCALE // len(gfx)
+        rects = []
+        start = prev = None
+        for row in changed:
+            if start is None:
+                start = row
+            elif row != prev + 1:
+                rects.append(pygame.Rect(0, start*scale, WIDTH*SCALE, (prev - start + 1)*scale))
+                start = row
+            prev = row
+        if start is not None:
+            rects.append(pygame.Rect(0, start*scale, WIDTH*SCALE, (prev - start + 1)*scale))
+        return rects
+
     def draw(self, chip8):
-        self.screen.fill((0, 0, 0))
-        for y in range(HEIGHT):
-            for x in range(WIDTH):
-                if chip8.gfx[x + y*WIDTH]:
-                    pygame.draw.rect(self.screen, (255, 255, 255),
-                                     (x*SCALE, y*SCALE, SCALE, SCALE))
-        pygame.display.flip()
+        """Present the machine's framebuffer. Returns False if skipped by the frame-rate cap"""
+        return self.present(chip8.gfx)
+
+    def present(self, gfx):
+        """Present a (32, 64) or (64, 128) framebuffer. Returns False if skipped by the frame-rate cap"""
+        now = pygame.time.get_ticks()
+        if self.last_present is not None and now - self.last_present < self.min_interval:
+            return False
+        self.last_present = now
+
+        if self.shown is None or self.shown.shape != gfx.shape or self.overlay:
+            rects = None                  # First frame, new resolution or overlay: full flip
+            if self.frame.get_size() != gfx.shape[::-1]:
+                self.frame = pygame.Surface(gfx.shape[::-1], 0, self.screen)
+        else:
+            rects = self.dirty_rects(gfx)
+            if not rects:
+                return True
+
+        pygame.surfarray.blit_array(self.frame, self.colors[gfx.T])   # surfarray is (x, y)
+        pygame.transform.scale(self.frame, self.screen.get_size(), self.screen)
+        if self.overlay:
+            self.draw_overlay(self.overlay)
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.shown = gfx.copy()
+        return True
+
+    def draw_overlay(self, lines):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        for i, line in enumerate(lines):
+            text = self.font.render(line, True, (255, 255, 0), (0, 0, 96))
+            self.screen.blit(text, (4, 4 + i * 16))
 
     def handle_events(self, chip8):
         for event in pygame.event.get():
@@ -44,7 +107,19 @@ class Chip8Window:
             elif event.type == pygame.KEYDOWN:
                 if event.key in key_map:
                     chip8.key[key_map[event.key]] = 1
+                elif event.key == pygame.K_F5:
+                    self.requests.append("save")
+                elif event.key == pygame.K_F9:
+                    self.requests.append("load")
+                elif event.key == pygame.K_BACKSPACE:
+                    self.rewinding = True
+                elif event.key == pygame.K_F1:
+                    self.show_overlay = not self.show_overlay
+                    self.overlay = None
+                    self.shown = None     # Full redraw: the old overlay text is still on screen
             elif event.type == pygame.KEYUP:
                 if event.key in key_map:
                     chip8.key[key_map[event.key]] = 0
+                elif event.key == pygame.K_BACKSPACE:
+                    self.rewinding = False
         return True